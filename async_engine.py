@@ -0,0 +1,388 @@
+"""
+Optional asyncio engine: runs every channel loop, fetch, Gemini call and
+delete as coroutines on a single event loop instead of one thread each.
+
+Enable it with BOT_ENGINE=asyncio in .env (requires `pip install aiohttp`).
+Message selection, prompts and conversation memory are shared with bot.py,
+so per-channel settings behave exactly like the threaded loops.
+"""
+import asyncio
+import time
+from functools import partial
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+import bot
+from gemini_client import gemini_payload
+from http_client import pool_size, connect_timeout, read_timeout, discord_limiter, discord_url, gemini_url
+from deadline import Deadline
+from single_flight import AsyncSingleFlight
+
+RESTART_DELAY = 30  # Seconds before a channel loop that crashed is started again
+
+def trace_config(api):
+    # Feeds aiohttp responses into the same latency histogram as the requests hook
+    async def on_request_start(session, context, params):
+        context.started = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        bot.observe_http(api, params.method, params.response.status, time.perf_counter() - context.started)
+
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(on_request_start)
+    config.on_request_end.append(on_request_end)
+    return config
+
+class AsyncEngine:
+    def __init__(self):
+        self.discord_sessions = {}
+        self.gemini = None
+        self.delete_tasks = set()
+        self.lookups = AsyncSingleFlight()
+        bot.single_flights["discord"] = self.lookups
+
+    def discord(self, token):
+        # One pooled client session per token, mirrors http_client.discord_session
+        session = self.discord_sessions.get(token)
+        if session is None:
+            connector = aiohttp.TCPConnector(limit=pool_size)
+            session = aiohttp.ClientSession(connector=connector, headers={'Authorization': token, 'Accept': 'application/json'},
+                                            timeout=self.request_timeout(), trace_configs=[trace_config("discord")])
+            self.discord_sessions[token] = session
+        return session
+
+    def gemini_session(self):
+        if self.gemini is None:
+            connector = aiohttp.TCPConnector(limit=pool_size)
+            self.gemini = aiohttp.ClientSession(connector=connector, headers={'Content-Type': 'application/json'},
+                                                timeout=self.request_timeout(), trace_configs=[trace_config("gemini")])
+        return self.gemini
+
+    def request_timeout(self, deadline=None):
+        # Same connect/read split as the requests sessions, aiohttp's own default is 5 minutes total
+        connect, read = deadline.timeout() if deadline is not None else (connect_timeout, read_timeout)
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+
+    async def close(self):
+        for session in self.discord_sessions.values():
+            await session.close()
+        if self.gemini is not None:
+            await self.gemini.close()
+
+    async def discord_request(self, method, path, token, deadline=None, **kwargs):
+        """
+        Same rate limit buckets and single 429 retry as http_client.DiscordSession,
+        bounded by the deadline. Returns the response with its body already read.
+        """
+        url = discord_url(path)
+        if deadline is None:
+            deadline = Deadline(read_timeout, connect_timeout)  # Same whole-call bound as DiscordSession
+        for attempt in range(2):
+            while (wait := discord_limiter.reserve(token, method, url)) > 0:
+                if wait > deadline.remaining():
+                    raise aiohttp.ServerTimeoutError(f"Rate limit Discord untuk {method} {url} lebih lama dari timeout {deadline.remaining():.1f} detik")
+                await asyncio.sleep(wait)
+            async with self.discord(token).request(method, url, timeout=self.request_timeout(deadline), **kwargs) as response:
+                await response.read()
+            body = None
+            if response.status == 429:
+                try:
+                    body = await response.json(content_type=None)
+                except ValueError:
+                    pass  # e.g. a Cloudflare HTML page, the headers still say how long to wait
+            retry_after = discord_limiter.update(token, method, url, response.status, response.headers, body)
+            if retry_after is None or attempt or retry_after >= deadline.remaining():
+                return response
+            await asyncio.sleep(retry_after)
+
+    async def fetch_json(self, path, token, deadline=None):
+        # Channels starting together share one request per (token, path), like bot.fetch_discord_json
+        async def load():
+            response = await self.discord_request("GET", path, token, deadline)
+            response.raise_for_status()
+            return await response.json()
+        return await self.lookups.do((token, path), load)
+
+    async def get_bot_user_id(self, channel_id, token):
+        try:
+            data = await self.fetch_json("/users/@me", token)
+            return data.get('id')
+        except (aiohttp.ClientError, ValueError) as e:
+            bot.log_message(f"[Channel {channel_id}] Gagal mengambil info bot: {e}", "ERROR")
+            return None
+
+    async def fetch_channel(self, channel_id, token, deadline=None):
+        # Reads through the same TTL cache as the threaded loops
+        key = ("channel", channel_id)
+        data = bot.metadata_cache.get(key)
+        if data is None:
+            data = await self.fetch_json(f"/channels/{channel_id}", token, deadline)
+            bot.metadata_cache.set(key, data)
+        return data
+
+    async def get_slow_mode_delay(self, channel_id, token, deadline=None):
+        try:
+            data = await self.fetch_channel(channel_id, token, deadline)
+            slow_mode_delay = data.get("rate_limit_per_user", 0)
+            bot.log_message(f"[Channel {channel_id}] Slow mode delay: {slow_mode_delay} detik", "INFO")
+            return slow_mode_delay
+        except (aiohttp.ClientError, ValueError) as e:
+            bot.log_message(f"[Channel {channel_id}] Gagal mengambil informasi slow mode: {e}", "ERROR")
+            return 5
+
+    async def gemini_generate(self, prompt_text, deadline=None):
+        # Same breakers and bounded retries as GeminiClient.generate, without blocking the loop
+        client = bot.gemini_client
+        payload = gemini_payload(prompt_text)
+        for attempt in range(client.max_attempts):
+            if client.out_of_time(deadline):
+                return None
+            api_key = client.acquire_key()
+            if api_key is None:
+                return None
+            try:
+                async with self.gemini_session().post(gemini_url(api_key), json=payload, timeout=self.request_timeout(deadline)) as response:
+                    try:
+                        body = await response.json(content_type=None)
+                    except ValueError:
+                        body = None
+                    text, backoff = client.handle_response(api_key, response.status, response.headers, body)
+            except aiohttp.ClientError as e:
+                text, backoff = None, client.on_failure(api_key, f"Request failed: {e}")
+            if text is not None:
+                return text
+            if backoff and attempt + 1 < client.max_attempts:
+                await asyncio.sleep(client.backoff(attempt, deadline))
+        client.log(f"Gemini gagal setelah {client.max_attempts} percobaan. Balasan dilewati.", "ERROR")
+        return None
+
+    async def generate_random_time_response(self, persona=None, deadline=None):
+        random_time = bot.generate_random_time()
+        if persona:
+            cached_text = bot.cached_time_response(persona, random_time)
+            if cached_text:
+                return cached_text
+            generated_text = await self.gemini_generate(bot.build_time_prompt(persona, random_time), deadline)
+            if generated_text:
+                bot.store_time_response(persona, random_time, generated_text)
+                return generated_text
+            bot.log_message("Error generating time response, using the plain time instead", "ERROR")
+        return f"It's {random_time}."
+
+    async def generate_reply(self, prompt, prompt_language, persona=None, conversation_history=None, deadline=None, prompt_lowered=None):
+        if bot.is_time_question(prompt, prompt_lowered):
+            bot.log_message(f"Detected time question: \"{prompt}\". Generating random time response.", "INFO")
+            return await self.generate_random_time_response(persona, deadline)
+
+        ai_prompt = bot.build_ai_prompt(prompt, prompt_language, persona, conversation_history)
+        if ai_prompt is None:
+            return None
+        cached_text = bot.cached_reply(ai_prompt, persona)
+        if cached_text:
+            return cached_text
+        for _ in range(bot.max_duplicate_retries + 1):
+            generated_text = await self.gemini_generate(ai_prompt, deadline)
+            if generated_text is None:
+                return None
+            if bot.remember_generated_text(generated_text):
+                bot.store_reply(ai_prompt, persona, generated_text)
+                return generated_text
+            bot.log_message("AI menghasilkan teks yang sama, meminta teks baru...", "WAIT")
+        return None
+
+    async def send_message(self, channel_id, message_text, token, reply_to=None, delete_after=None, delete_immediately=False, deadline=None):
+        payload = {'content': message_text}
+        if reply_to:
+            payload["message_reference"] = {"message_id": reply_to}
+        labels = bot.metric_labels(channel_id, token)
+        try:
+            with bot.timed_stage("send", labels, deadline or bot.new_deadline()) as send_deadline:
+                response = await self.discord_request("POST", f"/channels/{channel_id}/messages", token, send_deadline, json=payload)
+                if response.status not in [200, 201]:
+                    bot.log_message(f"[Channel {channel_id}] Gagal mengirim pesan. Status: {response.status}", "ERROR")
+                    bot.log_message(f"[Channel {channel_id}] Respons API: {await response.text()}", "ERROR")
+                    bot.stage_errors.inc(stage="send", **labels)
+                    return
+                data = await response.json()
+        except (aiohttp.ClientError, ValueError) as e:  # ValueError: a body that isn't JSON
+            bot.log_message(f"[Channel {channel_id}] Kesalahan saat mengirim pesan: {e}", "ERROR")
+            bot.stage_errors.inc(stage="send", **labels)
+            return
+
+        message_id = data.get("id")
+        bot.send_clock.record_send(channel_id)
+        bot.log_message(f"[Channel {channel_id}] Pesan terkirim: \"{message_text}\" (ID: {message_id})", "SUCCESS")
+        if delete_after is not None:
+            if delete_immediately:
+                bot.log_message(f"[Channel {channel_id}] Menghapus pesan segera tanpa delay...", "WAIT")
+                self.schedule_delete(channel_id, message_id, 0, token)
+            elif delete_after > 0:
+                bot.log_message(f"[Channel {channel_id}] Pesan akan dihapus dalam {delete_after} detik...", "WAIT")
+                self.schedule_delete(channel_id, message_id, delete_after, token)
+
+    def schedule_delete(self, channel_id, message_id, delay, token):
+        task = asyncio.create_task(self.delayed_delete(channel_id, message_id, delay, token), name=f"delete-{channel_id}")
+        # Keep a reference so pending deletes are not garbage collected
+        self.delete_tasks.add(task)
+        task.add_done_callback(self.delete_tasks.discard)
+
+    async def delayed_delete(self, channel_id, message_id, delay, token):
+        if delay:
+            await asyncio.sleep(delay)
+        await self.delete_message(channel_id, message_id, token)
+
+    async def delete_message(self, channel_id, message_id, token):
+        labels = bot.metric_labels(channel_id, token)
+        try:
+            with bot.timed_stage("delete", labels, bot.new_deadline()) as delete_deadline:
+                response = await self.discord_request("DELETE", f"/channels/{channel_id}/messages/{message_id}", token, delete_deadline)
+                if response.status == 204:
+                    bot.log_message(f"[Channel {channel_id}] Pesan dengan ID {message_id} berhasil dihapus.", "SUCCESS")
+                else:
+                    bot.log_message(f"[Channel {channel_id}] Gagal menghapus pesan. Status: {response.status}", "ERROR")
+                    bot.log_message(f"[Channel {channel_id}] Respons API: {await response.text()}", "ERROR")
+                    bot.stage_errors.inc(stage="delete", **labels)
+        except aiohttp.ClientError as e:
+            bot.log_message(f"[Channel {channel_id}] Kesalahan saat menghapus pesan: {e}", "ERROR")
+            bot.stage_errors.inc(stage="delete", **labels)
+
+    async def fetch_messages(self, channel_id, token, after, deadline):
+        # Same fallback to the latest page as bot.fetch_messages
+        response = await self.discord_request("GET", bot.messages_path(channel_id, after), token, deadline)
+        response.raise_for_status()
+        messages = await response.json()
+        if bot.page_overflowed(messages, after):
+            bot.log_message(f"[Channel {channel_id}] Lebih dari {bot.fetch_limit} pesan baru, membaca halaman terbaru saja.", "INFO")
+            response = await self.discord_request("GET", bot.messages_path(channel_id), token, deadline)
+            response.raise_for_status()
+            messages = bot.newer_than(await response.json(), after)
+        return [bot.parse_message(message) for message in messages]
+
+    async def wait_for_send_slot(self, channel_id, slow_mode_delay):
+        remaining = bot.send_clock.remaining_wait(channel_id, slow_mode_delay)
+        if remaining > 0:
+            bot.log_message(f"[Channel {channel_id}] Slow mode aktif, menunggu {remaining:.1f} detik lagi...", "WAIT")
+            await asyncio.sleep(remaining)
+        return remaining
+
+    async def send_reply(self, channel_id, response_text, token, settings, reply_to_id, deadline=None):
+        await self.send_message(channel_id, response_text, token,
+                                reply_to=reply_to_id if settings["use_reply"] else None,
+                                delete_after=settings["delete_bot_reply"], delete_immediately=settings["delete_immediately"],
+                                deadline=deadline)
+
+    async def auto_reply(self, channel_id, settings, token, bot_user_id=None):
+        if not settings["use_google_ai"]:
+            while True:
+                delay = settings["delay_interval"]
+                bot.log_message(f"[Channel {channel_id}] Menunggu {delay} detik sebelum mengirim pesan dari file...", "WAIT")
+                await asyncio.sleep(delay)
+                message_text = await asyncio.to_thread(bot.get_random_message_from_file)
+                await self.send_message(channel_id, message_text, token, delete_after=settings["delete_bot_reply"], delete_immediately=settings["delete_immediately"])
+
+        if bot_user_id is None:
+            bot_user_id = await self.get_bot_user_id(channel_id, token)
+            if bot_user_id is None:
+                return
+        labels = bot.metric_labels(channel_id, token)
+
+        while True:
+            prompt = None
+            relevant_message = None
+            slow_mode_delay = 0
+            messages = None
+
+            bot.log_message(f"[Channel {channel_id}] Menunggu {settings['read_delay']} detik sebelum membaca pesan...", "WAIT")
+            await asyncio.sleep(settings["read_delay"])
+            deadline = bot.new_deadline()
+            try:
+                # The first lookup reads the state store, keep disk access off the event loop
+                after = await asyncio.to_thread(bot.channel_cursors.get, channel_id)
+                with bot.timed_stage("fetch", labels, deadline) as fetch_deadline:
+                    messages = await self.fetch_messages(channel_id, token, after, fetch_deadline)
+                bot.channel_cursors.advance(channel_id, messages)
+                bot.send_clock.observe_messages(channel_id, messages, bot_user_id)
+
+                if messages:
+                    with bot.timed_stage("classify", labels):
+                        relevant_message, highest_score = bot.select_relevant_message(messages, bot_user_id, channel_id)
+                    if relevant_message:
+                        message_id = relevant_message.id
+                        prompt = relevant_message.content
+                        bot.log_message(f"[Channel {channel_id}] Selected most relevant message: '{prompt}' (Score: {highest_score})", "INFO")
+
+                        if settings["use_slow_mode"]:
+                            slow_mode_delay = await self.get_slow_mode_delay(channel_id, token, deadline.split(bot.stage_shares["fetch"]))
+
+                        bot.processed_message_ids.add(message_id)
+            except (aiohttp.ClientError, ValueError) as e:
+                bot.log_message(f"[Channel {channel_id}] Request error: {e}", "ERROR")
+                bot.stage_errors.inc(stage="fetch", **labels)
+                prompt = None
+
+            if prompt and relevant_message:
+                user_id = relevant_message.author_id
+                conversation_history = await asyncio.to_thread(bot.get_conversation_history, user_id, channel_id)
+                with bot.timed_stage("generate", labels, deadline) as generate_deadline:
+                    result = await self.generate_reply(prompt, settings["prompt_language"], settings.get("persona"), conversation_history, generate_deadline,
+                                                   relevant_message.lowered)
+
+                if result is None:
+                    bot.log_message(f"[Channel {channel_id}] Tidak ada balasan dari AI. Pesan dilewati.", "WARNING")
+                    bot.stage_errors.inc(stage="generate", **labels)
+                else:
+                    response_text = result if result else "Sorry, I couldn't reply to your message."
+                    if response_text.strip().lower() == relevant_message.lowered:
+                        bot.log_message(f"[Channel {channel_id}] Balasan sama dengan pesan yang diterima. Tidak mengirim balasan.", "WARNING")
+                    else:
+                        deadline.pause(await self.wait_for_send_slot(channel_id, slow_mode_delay))
+                        await self.send_reply(channel_id, response_text, token, settings, relevant_message.id, deadline)
+                        await asyncio.to_thread(bot.update_conversation_history, user_id, channel_id, prompt, response_text)
+            else:
+                bot.log_message(f"[Channel {channel_id}] Tidak ada pesan baru atau pesan tidak valid.", "INFO")
+            bot.report_overrun("iteration", labels, deadline)
+
+            interval = bot.next_poll_interval(channel_id, settings, messages, bot_user_id)
+            bot.log_poll_wait(channel_id, settings, interval)
+            await asyncio.sleep(interval)
+
+    async def periodic_cleanup(self):
+        while True:
+            await asyncio.sleep(3600)  # Run cleanup every hour
+            bot.cleanup_expired_conversations()
+
+    async def supervise(self, label, make_coroutine):
+        """
+        Runs one loop and restarts it after an unexpected error, so one broken
+        channel doesn't end gather() and cancel all the others (a thread would
+        only take itself down).
+        """
+        while True:
+            try:
+                return await make_coroutine()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                bot.log_message(f"[{label}] Error tak terduga: {type(e).__name__}: {e}. Dimulai ulang dalam {RESTART_DELAY} detik.", "ERROR")
+                await asyncio.sleep(RESTART_DELAY)
+
+    async def run(self, channel_tokens, server_settings, bot_user_ids):
+        if bot.profiler is not None:
+            bot.profiler.watch_loop()
+        tasks = [asyncio.create_task(self.supervise("Cleanup", self.periodic_cleanup), name="cleanup")]
+        for channel_id, token in channel_tokens.items():
+            loop = partial(self.auto_reply, channel_id, server_settings[channel_id], token, bot_user_ids.get(token))
+            tasks.append(asyncio.create_task(self.supervise(f"Channel {channel_id}", loop), name=f"channel-{channel_id}"))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await self.close()
+
+def run(channel_tokens, server_settings, bot_user_ids=None):
+    """Run every channel on one event loop. channel_tokens maps channel ID -> token."""
+    if aiohttp is None:
+        raise RuntimeError("BOT_ENGINE=asyncio membutuhkan aiohttp. Install dengan: pip install aiohttp")
+    asyncio.run(AsyncEngine().run(channel_tokens, server_settings, bot_user_ids or {}))
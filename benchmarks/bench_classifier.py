@@ -0,0 +1,77 @@
+"""
+Microbenchmark for the message classifier on synthetic Discord payloads.
+
+    python benchmarks/bench_classifier.py [--messages 10000] [--repeat 5]
+
+Prints messages per second for classify_message() and for scan_content(),
+the content checks it runs on messages that get that far.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier import classify_message, parse_message, scan_content
+
+BOT_ID = "100000000000000001"
+OTHER_IDS = ["200000000000000002", "300000000000000003", "400000000000000004"]
+SAMPLES = [
+    "hey everyone, how is it going today?",
+    "can someone help me with the bridge please",
+    "gm gm",
+    "what time is it over there?",
+    "check this out https://example.com/some/long/path",
+    "lol 😂😂😂",
+    "<:pepe:123456789012345678> nice",
+    "thanks a lot, that fixed it!",
+    "terima kasih banyak bro",
+    "ok",
+]
+
+def make_message(index, rng):
+    author = rng.choice(OTHER_IDS + [BOT_ID])
+    content = rng.choice(SAMPLES)
+    message = {
+        "id": str(1100000000000000000 + index),
+        "content": content,
+        "author": {"id": author, "username": "user"},
+        "mentions": [],
+        "attachments": [],
+    }
+    roll = rng.random()
+    if roll < 0.1:
+        message["content"] = f"<@{BOT_ID}> {content}"
+        message["mentions"] = [{"id": BOT_ID}]
+    elif roll < 0.15:
+        message["content"] = f"<@{rng.choice(OTHER_IDS)}> {content}"
+        message["mentions"] = [{"id": OTHER_IDS[0]}]
+    elif roll < 0.25:
+        replied = rng.choice([BOT_ID] + OTHER_IDS)
+        message["message_reference"] = {"message_id": "1"}
+        message["referenced_message"] = {"author": {"id": replied}}
+    if rng.random() < 0.05:
+        message["attachments"] = [{"id": "1"}]
+    return message
+
+def bench(label, func, messages, repeat):
+    best = min(timeit.repeat(lambda: [func(message) for message in messages], number=1, repeat=repeat))
+    print(f"{label:<28} {len(messages) / best:>12,.0f} msg/s  ({best * 1e6 / len(messages):.2f} us/msg)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    messages = [parse_message(make_message(i, rng)) for i in range(args.messages)]
+
+    bench("classify_message", lambda m: classify_message(m, BOT_ID), messages, args.repeat)
+    bench("scan_content", lambda m: scan_content(m.content), messages, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Offline end-to-end benchmark: runs the real channel loops against the local
+Discord / Gemini stand-ins from standins.py.
+
+    python benchmarks/bench_end_to_end.py [--channels 20] [--duration 30] [--engine thread]
+
+Stand-in options (latency, 429 injection, message arrival rate) are the same
+as standins.py. Prints loop iterations per second, reply latency percentiles
+(message arrival at the stand-in until the reply POST), per-stage timings,
+peak RSS and thread counts.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import standins
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def peak_rss_mb():
+    if resource is None:
+        return float("nan")
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def channel_settings(options):
+    return {
+        "prompt_language": "en",
+        "use_google_ai": True,
+        "enable_read_message": True,
+        "read_delay": 0,
+        "delay_interval": options.interval,
+        "use_slow_mode": options.slow_mode > 0,
+        "use_reply": True,
+        "delete_bot_reply": options.delete_after,
+        "delete_immediately": False,
+        "persona": None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--channels", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=2, help="fake Discord tokens, channels are spread over them")
+    parser.add_argument("--keys", type=int, default=2, help="fake Gemini API keys")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run the channel loops")
+    parser.add_argument("--interval", type=float, default=1.0, help="delay_interval of every channel")
+    parser.add_argument("--delete-after", type=int, default=None, help="delete each reply after this many seconds")
+    parser.add_argument("--engine", choices=("thread", "asyncio"), default="thread")
+    parser.add_argument("--log-level", default="ERROR")
+    parser.add_argument("--profile", metavar="DIR", help="also run the sampling profiler, dumps go to DIR")
+    standins.add_arguments(parser)
+    options = parser.parse_args()
+
+    # The stand-ins get their own process so they do not share the GIL, memory or thread count with the bot
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=standins.serve, args=(options,), kwargs={"ready": ready}, daemon=True)
+    server.start()
+    base = f"http://127.0.0.1:{ready.get(timeout=10)}"
+
+    # Must be set before bot is imported, it reads its configuration at import time
+    os.environ.update({
+        "DISCORD_API_BASE": f"{base}/api/v9",
+        "GEMINI_API_BASE": f"{base}/v1beta",
+        "DISCORD_TOKENS": ",".join(f"bench-token-{index}" for index in range(options.tokens)),
+        "GOOGLE_API_KEYS": ",".join(f"bench-key-{index}" for index in range(options.keys)),
+        "BOT_ENGINE": options.engine,
+        "LOG_LEVEL": options.log_level,
+    })
+    # Empty rather than unset, load_dotenv() would fill unset ones back in from .env
+    for name in ("STATE_DB", "METRICS_PORT", "METRICS_JSON_FILE", "CHANNEL_CONFIG"):
+        os.environ[name] = ""
+    import bot
+
+    channel_ids = [str(900000000000000000 + index) for index in range(options.channels)]
+    channel_tokens = {channel_id: bot.discord_tokens[index % len(bot.discord_tokens)] for index, channel_id in enumerate(channel_ids)}
+    settings = {channel_id: channel_settings(options) for channel_id in channel_ids}
+    bot_user_ids = {token: bot.get_bot_info(token)[2] for token in bot.discord_tokens}
+
+    if options.profile:
+        bot.start_profiling(options.profile)
+    threads_before = threading.active_count()
+    if options.engine == "asyncio":
+        import async_engine
+        threading.Thread(target=async_engine.run, args=(channel_tokens, settings, bot_user_ids), daemon=True).start()
+    else:
+        for channel_id, token in channel_tokens.items():
+            threading.Thread(target=bot.auto_reply, args=(channel_id, settings[channel_id], token, bot_user_ids[token]),
+                             name=f"channel-{channel_id}", daemon=True).start()
+
+    started = time.perf_counter()
+    peak_threads = threading.active_count()
+    while time.perf_counter() - started < options.duration:
+        time.sleep(0.25)
+        peak_threads = max(peak_threads, threading.active_count())
+    elapsed = time.perf_counter() - started
+
+    if bot.profiler is not None:
+        bot.profiler.stop()
+    stats = json.load(urllib.request.urlopen(f"{base}/_stats"))
+    stages = {}
+    for sample in bot.metrics.snapshot()["metrics"]["bot_stage_seconds"]["samples"]:
+        total = stages.setdefault(sample["labels"]["stage"], [0, 0.0])
+        total[0] += sample["count"]
+        total[1] += sample["sum"]
+    latencies = stats["reply_latencies"]
+    iterations = stages.get("fetch", [0])[0]
+
+    bot.logger.flush()
+    print(f"engine={options.engine} channels={options.channels} duration={elapsed:.1f}s")
+    print(f"iterations        {iterations} ({iterations / elapsed:.1f}/s)")
+    print(f"replies           {len(latencies)} ({len(latencies) / elapsed:.1f}/s)")
+    print("reply latency     " + "  ".join(f"p{pct}={percentile(latencies, pct) * 1000:.0f}ms" for pct in (50, 90, 99)))
+    for stage, (count, seconds) in sorted(stages.items()):
+        print(f"  {stage:<15} {count:>7} calls  mean {seconds / count * 1000:.1f}ms")
+    print(f"stand-in requests {json.dumps(stats['counters'], sort_keys=True)}")
+    print(f"peak RSS          {peak_rss_mb():.1f} MB")
+    print(f"threads           {threads_before} before start, {peak_threads} peak")
+    server.terminate()
+
+if __name__ == "__main__":
+    main()
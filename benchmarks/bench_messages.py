@@ -0,0 +1,80 @@
+"""
+Per-message cost of the poll pipeline: parsing the fetched Discord JSON into
+ParsedMessage records, cursor / slow mode bookkeeping, classification and
+relevance scoring (select_relevant_message).
+
+    python benchmarks/bench_messages.py [--messages 10000] [--repeat 5]
+
+Prints time per message and, from tracemalloc, the memory allocated while
+processing a batch (peak) and what the parsed records keep alive afterwards.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_classifier import BOT_ID, make_message
+
+# bot reads its configuration at import time, nothing here talks to Discord or Gemini
+os.environ.update({"DISCORD_TOKENS": "bench-token", "GOOGLE_API_KEYS": "bench-key", "LOG_LEVEL": "ERROR"})
+for name in ("STATE_DB", "METRICS_PORT", "METRICS_JSON_FILE", "CHANNEL_CONFIG"):
+    os.environ[name] = ""
+import bot
+from classifier import parse_message
+
+CHANNEL_ID = "900000000000000000"
+
+def parse_batch(batch):
+    return [parse_message(message) for message in batch]
+
+def poll(batch):
+    # What auto_reply does with one fetched page before generating a reply
+    messages = parse_batch(batch)
+    bot.channel_cursors.advance(CHANNEL_ID, messages)
+    bot.send_clock.observe_messages(CHANNEL_ID, messages, BOT_ID)
+    return bot.select_relevant_message(messages, BOT_ID, CHANNEL_ID)
+
+def bench(label, func, batches, count, repeat):
+    best = min(timeit.repeat(lambda: [func(batch) for batch in batches], number=1, repeat=repeat))
+    print(f"{label:<20} {best * 1e6 / count:>8.2f} us/msg")
+
+def allocations(batches, count):
+    poll(batches[0])  # Warm up caches and lazily built automatons first
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for batch in batches:
+        poll(batch)
+    _, peak = tracemalloc.get_traced_memory()
+    start, _ = tracemalloc.get_traced_memory()
+    records = [parse_batch(batch) for batch in batches]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{'peak per page':<20} {peak - before:>8,} bytes ({len(batches[0])} messages)")
+    print(f"{'retained records':<20} {(retained - start) / count:>8.1f} bytes/msg")
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    messages = [make_message(i, rng) for i in range(args.messages)]
+    batches = [messages[start:start + bot.fetch_limit] for start in range(0, len(messages), bot.fetch_limit)]
+
+    bench("parse", parse_batch, batches, len(messages), args.repeat)
+    bench("poll pipeline", poll, batches, len(messages), args.repeat)
+    allocations(batches, len(messages))
+    bot.logger.flush()
+
+if __name__ == "__main__":
+    main()
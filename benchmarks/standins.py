@@ -0,0 +1,260 @@
+"""
+Local HTTP stand-ins for the Discord v9 endpoints bot.py uses and for Gemini
+generateContent, so the bot can run without live accounts.
+
+    python benchmarks/standins.py [--port 8080] [--message-rate 0.5] [--discord-429 0.01]
+
+Point the bot at it with
+    DISCORD_API_BASE=http://127.0.0.1:8080/api/v9
+    GEMINI_API_BASE=http://127.0.0.1:8080/v1beta
+
+Every channel receives new messages at --message-rate per second. Replies
+(POSTs with a message_reference) are matched with the message they answer,
+GET /_stats returns the reply latencies and request counters seen so far.
+With --bucket-limit every Discord response carries X-RateLimit-* headers and
+each (token, method, channel) bucket answers 429 once it is used up.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from channel_state import DISCORD_EPOCH, snowflake_key
+from bench_classifier import BOT_ID, make_message
+
+class StandInState:
+    def __init__(self, message_rate=0.5, seed=42, history=100):
+        self.message_rate = message_rate
+        self.rng = random.Random(seed)
+        self.started = time.time()
+        self.channels = {}  # channel_id -> deque of messages, oldest first
+        self.created = {}  # channel_id -> number of messages generated so far
+        self.sent_at = {}  # message_id -> arrival time, for reply latency
+        self.history = history
+        self.reply_latencies = []
+        self.counters = {}
+        self.sequence = 0
+        self.buckets = {}  # (token, method, major route) -> [remaining, reset time]
+        self.lock = threading.Lock()
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def snowflake(self, at):
+        # Caller must hold the lock
+        self.sequence = (self.sequence + 1) & 0x3FFFFF
+        return str(((int(at * 1000) - DISCORD_EPOCH * 1000) << 22) | self.sequence)
+
+    def messages(self, channel_id, after=None, limit=50):
+        """Generates whatever arrived since the last poll, returns the page newest first like Discord."""
+        now = time.time()
+        with self.lock:
+            channel = self.channels.setdefault(channel_id, deque(maxlen=self.history))
+            due = int((now - self.started) * self.message_rate)
+            created = self.created.get(channel_id, 0)
+            # Never generate more than one page of backlog at once
+            for index in range(max(created, due - self.history), due):
+                message = make_message(index, self.rng)
+                message["id"] = self.snowflake(now)
+                message["channel_id"] = channel_id
+                channel.append(message)
+                self.sent_at[message["id"]] = now
+            self.created[channel_id] = due
+            if after:
+                # Like Discord: the oldest `limit` messages after the cursor
+                after_key = snowflake_key(after)
+                page = [message for message in channel if snowflake_key(message["id"]) > after_key][:limit]
+            else:
+                page = list(channel)[-limit:]
+        return list(reversed(page))
+
+    def record_post(self, channel_id, payload):
+        now = time.time()
+        with self.lock:
+            message_id = self.snowflake(now)
+            reference = (payload.get("message_reference") or {}).get("message_id")
+            arrived = self.sent_at.pop(reference, None) if reference else None
+            if arrived is not None:
+                self.reply_latencies.append(now - arrived)
+        return {"id": message_id, "channel_id": channel_id, "content": payload.get("content", ""), "author": {"id": BOT_ID}}
+
+    def take(self, key, limit, window):
+        """One request against a rate limit bucket, returns (allowed, remaining, reset_after)."""
+        now = time.time()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None or bucket[1] <= now:
+                bucket = self.buckets[key] = [limit, now + window]
+            allowed = bucket[0] > 0
+            if allowed:
+                bucket[0] -= 1
+            return allowed, bucket[0], bucket[1] - now
+
+    def stats(self):
+        with self.lock:
+            return {"reply_latencies": list(self.reply_latencies), "counters": dict(self.counters)}
+
+def make_handler(state, options):
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, so the bot's connection pools behave like production
+
+        def log_message(self, format, *args):
+            pass
+
+        def reply(self, status, body=None, headers=None):
+            data = json.dumps(body).encode("utf-8") if body is not None else b""
+            self.send_response(status)
+            for name, value in {**self.rate_limit_headers, **(headers or {})}.items():
+                self.send_header(name, value)
+            if body is not None:
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The bot gave up on this request (timeout), nothing to report
+
+        def read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                return json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return {}
+
+        def simulate(self, api):
+            """Sleeps for the configured latency, returns True when this request should get a 429."""
+            latency = options.discord_latency if api == "discord" else options.gemini_latency
+            if latency:
+                time.sleep(latency / 1000 * random.uniform(1 - options.jitter, 1 + options.jitter))
+            chance = options.discord_429 if api == "discord" else options.gemini_429
+            return random.random() < chance
+
+        def rate_limited(self, api):
+            state.count(f"{api}_429")
+            if api == "discord":
+                self.reply(429, {"message": "You are being rate limited.", "retry_after": options.retry_after, "global": False},
+                           {"Retry-After": str(options.retry_after)})
+            else:
+                self.reply(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "details": [
+                    {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{options.retry_after}s"}
+                ]}})
+
+        def route(self, method):
+            self.rate_limit_headers = {}  # Connections are kept alive, reset per request
+            url = urlsplit(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            if parts == ["_stats"]:
+                return self.reply(200, state.stats())
+            if parts[:2] == ["api", "v9"]:
+                return self.discord(method, parts[2:], parse_qs(url.query))
+            if parts[:1] == ["v1beta"] and method == "POST" and parts[-1].endswith(":generateContent"):
+                return self.gemini()
+            self.reply(404, {"message": "404: Not Found", "code": 0})
+
+        def bucket_headers(self, method, parts):
+            """X-RateLimit-* headers for this request, or a 429 reply when its bucket is used up."""
+            major = "/".join(parts[:2]) if parts[:1] in (["channels"], ["guilds"]) else "/".join(parts)
+            name = f"{method}-{parts[2] if len(parts) > 2 else parts[0]}"
+            allowed, remaining, reset_after = state.take((self.headers.get("Authorization"), name, major),
+                                                         options.bucket_limit, options.bucket_window)
+            headers = {"X-RateLimit-Bucket": name, "X-RateLimit-Limit": str(options.bucket_limit),
+                       "X-RateLimit-Remaining": str(remaining), "X-RateLimit-Reset-After": f"{reset_after:.3f}"}
+            if allowed:
+                return headers
+            state.count("discord_bucket_429")
+            headers["Retry-After"] = f"{reset_after:.3f}"
+            self.reply(429, {"message": "You are being rate limited.", "retry_after": round(reset_after, 3), "global": False}, headers)
+            return None
+
+        def discord(self, method, parts, query):
+            state.count(f"discord_{method}")
+            payload = self.read_json() if method == "POST" else None
+            if self.simulate("discord"):
+                return self.rate_limited("discord")
+            if options.bucket_limit:
+                headers = self.bucket_headers(method, parts)
+                if headers is None:
+                    return
+                self.rate_limit_headers = headers
+            if method == "GET" and parts == ["users", "@me"]:
+                return self.reply(200, {"id": BOT_ID, "username": "standin", "discriminator": "0001"})
+            if method == "GET" and len(parts) == 2 and parts[0] == "guilds":
+                return self.reply(200, {"id": parts[1], "name": f"Guild {parts[1]}"})
+            if len(parts) >= 2 and parts[0] == "channels":
+                channel_id = parts[1]
+                if method == "GET" and len(parts) == 2:
+                    return self.reply(200, {"id": channel_id, "name": f"channel-{channel_id}", "guild_id": "1",
+                                            "rate_limit_per_user": options.slow_mode})
+                if parts[2:] == ["messages"]:
+                    if method == "GET":
+                        after = query.get("after", [None])[0]
+                        limit = int(query.get("limit", ["50"])[0])
+                        return self.reply(200, state.messages(channel_id, after, limit))
+                    if method == "POST":
+                        return self.reply(200, state.record_post(channel_id, payload))
+                if method == "DELETE" and len(parts) == 4 and parts[2] == "messages":
+                    return self.reply(204)
+            self.reply(404, {"message": "404: Not Found", "code": 0})
+
+        def gemini(self):
+            state.count("gemini_POST")
+            self.read_json()
+            if self.simulate("gemini"):
+                return self.rate_limited("gemini")
+            # Unique text every time, otherwise the duplicate-reply check asks again
+            text = f"stand-in reply {random.getrandbits(48):x}"
+            self.reply(200, {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]})
+
+        def do_GET(self):
+            self.route("GET")
+
+        def do_POST(self):
+            self.route("POST")
+
+        def do_DELETE(self):
+            self.route("DELETE")
+
+    return StandInHandler
+
+def add_arguments(parser):
+    parser.add_argument("--message-rate", type=float, default=0.5, help="new messages per second per channel")
+    parser.add_argument("--discord-latency", type=float, default=50, help="ms per Discord request")
+    parser.add_argument("--gemini-latency", type=float, default=400, help="ms per Gemini request")
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency varies by +/- this fraction")
+    parser.add_argument("--discord-429", type=float, default=0.0, help="chance of a 429 per Discord request")
+    parser.add_argument("--gemini-429", type=float, default=0.0, help="chance of a 429 per Gemini request")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="seconds advertised with each 429")
+    parser.add_argument("--bucket-limit", type=int, default=0, help="Discord requests per bucket and window, 0 sends no rate limit headers")
+    parser.add_argument("--bucket-window", type=float, default=5.0, help="seconds until a Discord bucket resets")
+    parser.add_argument("--slow-mode", type=int, default=0, help="rate_limit_per_user reported for every channel")
+    parser.add_argument("--seed", type=int, default=42)
+
+def serve(options, host="127.0.0.1", port=0, ready=None):
+    """Runs the stand-ins until the process ends. `ready` (a queue) receives the bound port."""
+    server = ThreadingHTTPServer((host, port), make_handler(StandInState(options.message_rate, options.seed), options))
+    server.daemon_threads = True
+    if ready is not None:
+        ready.put(server.server_address[1])
+    server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    add_arguments(parser)
+    options = parser.parse_args()
+    print(f"Stand-ins on http://{options.host}:{options.port} (Discord: /api/v9, Gemini: /v1beta)")
+    serve(options, options.host, options.port)
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,54 @@
+import argparse
+import atexit
 import json
 import threading
 import time
 import os
 import random
-import re
+import sys
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from datetime import datetime
-from colorama import init, Fore, Style
+from functools import lru_cache
+from colorama import init
+from channel_config import load_channel_config
+from channel_state import RecentIdSet, ChannelCursors, SendClock, PollIntervals, snowflake_key
+from classifier import classify_message, parse_message
+from conversation_store import ConversationStore
+from corpus import MessageCorpus
+from deadline import Deadline
+from delete_scheduler import DeleteScheduler
+from keyword_matcher import KeywordMatcher
+from log_writer import QueueLogger, ConsoleFormatter, JsonFormatter
+from metadata_cache import TTLCache
+from profiler import SamplingProfiler
+from prompt_builder import PromptBuilder
+from response_cache import ResponseCache
+from single_flight import SingleFlight
+from state_store import StateStore
+from gemini_client import GeminiKeyPool, GeminiClient
+from http_client import discord_session, discord_url, close_all_sessions, add_response_hook, connect_timeout, discord_limiter
+from metrics import MetricsRegistry, start_http_server, start_snapshot_writer
 
 init(autoreset=True)
 load_dotenv()
 
+# Log records are queued and written by one background thread
+log_sinks = [(sys.stdout, ConsoleFormatter(border=os.getenv('LOG_BORDER', 'y').strip().lower() == 'y'))]
+log_json_path = os.getenv('LOG_JSON_FILE', '').strip()
+if log_json_path:
+    log_sinks.append((open(log_json_path, "a", encoding="utf-8"), JsonFormatter()))
+logger = QueueLogger(
+    min_level=os.getenv('LOG_LEVEL', 'WAIT'),
+    sinks=log_sinks,
+    repeat_window=int(os.getenv('LOG_REPEAT_WINDOW', '60'))
+)
+atexit.register(logger.close)
+
+def log_message(message, level="INFO"):
+    logger.log(message, level)
+
 discord_tokens_env = os.getenv('DISCORD_TOKENS', '')
 if discord_tokens_env:
     discord_tokens = [token.strip() for token in discord_tokens_env.split(',') if token.strip()]
@@ -26,222 +63,265 @@ google_api_keys = [key.strip() for key in google_api_keys if key.strip()]
 if not google_api_keys:
     raise ValueError("Tidak ada Google API Key yang ditemukan! Harap atur GOOGLE_API_KEYS di .env.")
 
-processed_message_ids = set()
-used_api_keys = set()
-last_generated_text = None
-cooldown_time = 86400
-
 # Conversation memory settings
-user_conversations = {}  # To store conversation history by user ID
 conversation_expiry = 3600  # Conversation expires after 1 hour of inactivity
 max_conversation_length = 7  # Maximum number of previous exchanges to remember
 
-def log_message(message, level="INFO"):
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-    if level.upper() == "SUCCESS":
-        color, icon = Fore.GREEN, "✅"
-    elif level.upper() == "ERROR":
-        color, icon = Fore.RED, "🚨"
-    elif level.upper() == "WARNING":
-        color, icon = Fore.YELLOW, "⚠️"
-    elif level.upper() == "WAIT":
-        color, icon = Fore.CYAN, "⌛"
-    else:
-        color, icon = Fore.WHITE, "ℹ️"
+# Optional SQLite state so cursors and conversations survive restarts
+state_store = None
+state_db_path = os.getenv('STATE_DB', '').strip()
+if state_db_path:
+    state_store = StateStore(state_db_path, retention=conversation_expiry, log_func=log_message)
+
+# Only the newest IDs are kept, channel cursors already skip anything older
+# A stored cursor resumes a warm start; after longer downtime its first page is full
+# and fetch_messages falls back to the latest page instead of replying to the backlog.
+processed_message_ids = RecentIdSet(maxlen=int(os.getenv('PROCESSED_IDS_MAX', '5000')))
+channel_cursors = ChannelCursors(
+    loader=state_store.load_cursor if state_store else None,
+    on_advance=state_store.save_cursor if state_store else None
+)
+send_clock = SendClock()  # Last successful send per channel, for slow mode
+fetch_limit = 10  # Messages read per poll
+
+# Idle channels are polled less often: each empty poll multiplies the interval by idle_backoff,
+# capped at max_delay_interval (default delay_interval * IDLE_MAX_FACTOR). Channels can override both.
+poll_intervals = PollIntervals()
+idle_backoff = float(os.getenv('IDLE_BACKOFF', '2'))
+idle_max_factor = float(os.getenv('IDLE_MAX_FACTOR', '4'))
+
+# Seconds one iteration may spend on network work (configured delays and slow mode excluded).
+# Each stage gets a share of it, deletes run later and get their share on their own.
+iteration_budget = float(os.getenv('ITERATION_BUDGET', '60'))
+stage_shares = {"fetch": 0.2, "generate": 0.6, "send": 0.2, "delete": 0.2}
+
+# Channel and guild metadata, shared by every channel thread
+metadata_cache = TTLCache(ttl=int(os.getenv('METADATA_CACHE_TTL', '300')))
+discord_lookups = SingleFlight()  # Identical GETs in flight at the same time share one request
+single_flights = {"discord": discord_lookups}  # Exported as bot_single_flight_shared_total, the asyncio engine swaps in its own
 
-    border = f"{Fore.MAGENTA}{'=' * 80}{Style.RESET_ALL}"
-    formatted_message = f"{color}[{timestamp}] {icon} {message}{Style.RESET_ALL}"
-    print(border)
-    print(formatted_message)
-    print(border)
+last_generated_text = None
+max_duplicate_retries = 2  # New generations requested when the AI repeats its previous reply
+
+# Opt-in cache of Gemini replies, keyed by the final prompt and persona
+response_cache = None
+if os.getenv('RESPONSE_CACHE', 'n').strip().lower() == 'y':
+    response_cache = ResponseCache(
+        max_bytes=int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(1024 * 1024))),
+        ttl=int(os.getenv('RESPONSE_CACHE_TTL', '600')),
+        max_variants=int(os.getenv('RESPONSE_CACHE_VARIANTS', '3'))
+    )
+TIME_PLACEHOLDER = "{time}"
+
+# Estimated tokens per reply prompt, older history is left out first when it would not fit
+prompt_builder = PromptBuilder(token_budget=int(os.getenv('PROMPT_TOKEN_BUDGET', '2000')))
+
+conversation_store = ConversationStore(  # History per (user ID, channel ID)
+    max_conversation_length, conversation_expiry,
+    loader=(lambda user_id, channel_id: state_store.load_exchanges(user_id, channel_id, max_conversation_length, conversation_expiry)) if state_store else None,
+    on_add=state_store.save_exchange if state_store else None
+)
+
+# Patterns that indicate the user is asking for the time
+time_question_phrases = [
+    "what time", "what's the time", "what is the time", 
+    "current time", "time now", "time is it",
+    "got the time", "tell me the time",
+    "jam berapa", "sekarang jam", "waktu sekarang"
+] + [phrase.strip() for phrase in os.getenv('EXTRA_TIME_PHRASES', '').split(',') if phrase.strip()]
+
+# Keywords that might indicate the message is important
+relevance_keywords = [
+    "help", "question", "please", "thanks", "thank you", "tolong", "bantuan", "terima kasih"
+] + [keyword.strip() for keyword in os.getenv('EXTRA_RELEVANCE_KEYWORDS', '').split(',') if keyword.strip()]
+
+# Both lists live in one automaton so a message is scanned once for all phrases
+keyword_matcher = KeywordMatcher()
+keyword_matcher.add_all(time_question_phrases, "time")
+keyword_matcher.add_all(relevance_keywords, "relevance")
+
+# Lines for file mode, indexed once and re-read only when pesan.txt changes
+message_corpus = MessageCorpus(
+    "pesan.txt",
+    no_repeat=int(os.getenv('PESAN_NO_REPEAT', '0')),
+    weighted=os.getenv('PESAN_WEIGHTED', 'n').strip().lower() == 'y'
+)
+
+# "thread" runs one thread per channel, "asyncio" runs every channel on one event loop
+bot_engine = os.getenv('BOT_ENGINE', 'thread').strip().lower()
+startup_workers = int(os.getenv('STARTUP_WORKERS', '8'))  # Parallel lookups while starting up
+
+# Per-key circuit breakers, a rate limited key is skipped until its Retry-After passes
+gemini_key_pool = GeminiKeyPool(google_api_keys)
+gemini_client = GeminiClient(gemini_key_pool, max_attempts=int(os.getenv('GEMINI_MAX_ATTEMPTS', '4')), log_func=log_message)
+
+# Latency histograms and counters, served on METRICS_PORT and/or dumped to METRICS_JSON_FILE
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram("bot_stage_seconds", "Duration of each channel loop stage", ("stage", "channel", "token"))
+stage_errors = metrics.counter("bot_stage_errors_total", "Channel loop stages that failed", ("stage", "channel", "token"))
+http_seconds = metrics.histogram("bot_http_response_seconds", "Discord and Gemini time until response headers", ("api", "method", "status"))
+rate_limited = metrics.counter("bot_http_rate_limited_total", "HTTP 429 responses", ("api",))
+deadline_overruns = metrics.counter("bot_deadline_overruns_total", "Stages and iterations that took longer than their budget", ("stage", "channel", "token"))
+token_indexes = {token: str(index) for index, token in enumerate(discord_tokens)}  # Tokens are never used as labels
+metrics_port = os.getenv('METRICS_PORT', '').strip()
+metrics_json_path = os.getenv('METRICS_JSON_FILE', '').strip()
+metrics_json_interval = int(os.getenv('METRICS_JSON_INTERVAL', '60'))
+
+# Opt-in sampling profiler + tracemalloc, enabled with --profile DIR or PROFILE_DIR
+profiler = None
+profile_interval = float(os.getenv('PROFILE_INTERVAL', '300'))
+profile_sample_interval = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.01'))
+profile_keep = int(os.getenv('PROFILE_KEEP', '48'))
+profile_trace_frames = int(os.getenv('PROFILE_TRACE_FRAMES', '1'))
 
 def update_conversation_history(user_id, channel_id, user_message, bot_response):
-    # Create a unique key for each user in each channel
-    conversation_key = f"{user_id}:{channel_id}"
-    
-    # Get current timestamp
-    current_time = time.time()
-    
-    # Create or update conversation entry
-    if conversation_key not in user_conversations:
-        user_conversations[conversation_key] = {
-            "exchanges": [],
-            "last_update": current_time
-        }
-    
-    # Add the new exchange
-    user_conversations[conversation_key]["exchanges"].append({
-        "user": user_message,
-        "bot": bot_response,
-        "timestamp": current_time
-    })
-    
-    # Update the timestamp
-    user_conversations[conversation_key]["last_update"] = current_time
-    
-    # Trim conversation if it exceeds the maximum length
-    if len(user_conversations[conversation_key]["exchanges"]) > max_conversation_length:
-        user_conversations[conversation_key]["exchanges"] = user_conversations[conversation_key]["exchanges"][-max_conversation_length:]
-    
-    log_message(f"Updated conversation history for user {user_id} in channel {channel_id}. Total exchanges: {len(user_conversations[conversation_key]['exchanges'])}", "INFO")
+    total_exchanges = conversation_store.add_exchange(user_id, channel_id, user_message, bot_response)
+    log_message(f"Updated conversation history for user {user_id} in channel {channel_id}. Total exchanges: {total_exchanges}", "INFO")
 
 def get_conversation_history(user_id, channel_id):
-    conversation_key = f"{user_id}:{channel_id}"
-    
-    # If no conversation exists or it's expired, return empty
-    if conversation_key not in user_conversations:
-        return []
-    
-    # Check if conversation has expired
-    current_time = time.time()
-    if current_time - user_conversations[conversation_key]["last_update"] > conversation_expiry:
-        # Conversation expired, remove it
-        del user_conversations[conversation_key]
+    history = conversation_store.get_history(user_id, channel_id)
+    if history is None:
         log_message(f"Expired conversation removed for user {user_id} in channel {channel_id}", "INFO")
         return []
-    
-    return user_conversations[conversation_key]["exchanges"]
+    return history
 
 def cleanup_expired_conversations():
-    current_time = time.time()
-    keys_to_remove = []
-    
-    for key, conversation in user_conversations.items():
-        if current_time - conversation["last_update"] > conversation_expiry:
-            keys_to_remove.append(key)
-    
-    for key in keys_to_remove:
-        del user_conversations[key]
-    
-    if keys_to_remove:
-        log_message(f"Cleaned up {len(keys_to_remove)} expired conversations", "INFO")
-
-def get_random_api_key():
-    available_keys = [key for key in google_api_keys if key not in used_api_keys]
-    if not available_keys:
-        log_message("Semua API key terkena error 429. Menunggu 24 jam sebelum mencoba lagi...", "ERROR")
-        time.sleep(cooldown_time)
-        used_api_keys.clear()
-        return get_random_api_key()
-    return random.choice(available_keys)
+    removed = conversation_store.cleanup_expired()
+    if removed:
+        log_message(f"Cleaned up {removed} expired conversations", "INFO")
 
 def get_random_message_from_file():
     try:
-        with open("pesan.txt", "r", encoding="utf-8") as file:
-            messages = [line.strip() for line in file.readlines() if line.strip()]
-            return random.choice(messages) if messages else "Tidak ada pesan tersedia di file."
+        message = message_corpus.pick()
+        return message if message else "Tidak ada pesan tersedia di file."
     except FileNotFoundError:
         return "File pesan.txt tidak ditemukan!"
 
-def generate_language_specific_prompt(user_message, prompt_language, persona=None, conversation_history=None):
-    persona_prefix = ""
-    if persona:
-        persona_prefix = f"You are {persona}. Remember this character, but you show this character only if being asked. "
-    
-    history_text = ""
-    if conversation_history and len(conversation_history) > 0:
-        history_text = "Here's our conversation history (most recent last):\n"
-        for exchange in conversation_history:
-            history_text += f"User: {exchange['user']}\nYou: {exchange['bot']}\n"
-        history_text += "\nRemember this context when replying. Keep your response conversational and natural.\n"
-    
-    # Always use English regardless of prompt_language setting
-    return f"{persona_prefix}{history_text}Reply to the following message in English, maintaining the context of our previous conversation: {user_message}"
-
-def is_time_question(message):
-    # List of patterns that indicate the user is asking for the time
-    time_patterns = [
-        "what time", "what's the time", "what is the time", 
-        "current time", "time now", "time is it",
-        "got the time", "tell me the time",
-        "jam berapa", "sekarang jam", "waktu sekarang"
-    ]
-    return any(pattern in message.lower() for pattern in time_patterns)
-
-def generate_random_time_response(prompt_language, persona=None):
+@lru_cache(maxsize=1024)
+def keyword_tags(lowered_text):
+    # Keyed by the lowercased text only, so scoring and the time check share one automaton pass
+    return frozenset(keyword_matcher.tags(lowered_text, lowered=True))
+
+def is_time_question(message, lowered=None):
+    # `lowered`: the ParsedMessage's lowercased content, saves lowercasing the prompt again
+    return "time" in keyword_tags(lowered if lowered is not None else message.lower())
+
+def generate_random_time():
     # Generate a random hour and minute
     random_hour = random.randint(1, 12)
     random_minute = random.randint(0, 59)
     am_pm = random.choice(["AM", "PM"])
-    random_time = f"{random_hour}:{random_minute:02d} {am_pm}"
+    return f"{random_hour}:{random_minute:02d} {am_pm}"
+
+def build_time_prompt(persona, random_time):
+    # Always use English prompt regardless of prompt_language setting
+    return f"You are {persona}. Someone asked what time it is. Tell them it's {random_time} now. Answer in your character's style with 1 sentence in English only."
+
+def build_ai_prompt(prompt, prompt_language, persona=None, conversation_history=None):
+    # Always English regardless of prompt_language, history is trimmed to the token budget
+    return prompt_builder.build(prompt, persona, conversation_history)
+
+def cached_time_response(persona, random_time):
+    # Persona time answers are cached as templates, only the time itself changes
+    if response_cache is None:
+        return None
+    template = response_cache.get(response_cache.make_key("time", persona))
+    return template.replace(TIME_PLACEHOLDER, random_time) if template else None
+
+def store_time_response(persona, random_time, generated_text):
+    # Only cache answers where the time can be swapped out unambiguously
+    if response_cache is None or generated_text.count(random_time) != 1 or TIME_PLACEHOLDER in generated_text:
+        return
+    response_cache.put(response_cache.make_key("time", persona), generated_text.replace(random_time, TIME_PLACEHOLDER))
+
+def cached_reply(ai_prompt, persona):
+    # Any cached variant except the previous reply, so the duplicate check keeps working
+    if response_cache is None:
+        return None
+    cached_text = response_cache.get(response_cache.make_key("reply", ai_prompt, persona), exclude=last_generated_text)
+    if cached_text and remember_generated_text(cached_text):
+        log_message("Menggunakan balasan AI dari cache.", "INFO")
+        return cached_text
+    return None
+
+def store_reply(ai_prompt, persona, generated_text):
+    if response_cache is not None:
+        response_cache.put(response_cache.make_key("reply", ai_prompt, persona), generated_text)
+
+def generate_random_time_response(prompt_language, persona=None, deadline=None):
+    random_time = generate_random_time()
     
     if persona:
+        cached_text = cached_time_response(persona, random_time)
+        if cached_text:
+            return cached_text
         # If there's a persona, send the time info to the AI to format it in character
-        google_api_key = get_random_api_key()
-        
-        # Always use English prompt regardless of prompt_language setting
-        special_prompt = f"You are {persona}. Someone asked what time it is. Tell them it's {random_time} now. Answer in your character's style with 1 sentence in English only."
-            
-        url = f'https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent?key={google_api_key}'
-        headers = {'Content-Type': 'application/json'}
-        data = {'contents': [{'parts': [{'text': special_prompt}]}]}
-        
-        try:
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
-            result = response.json()
-            return result['candidates'][0]['content']['parts'][0]['text']
-        except requests.exceptions.RequestException as e:
-            log_message(f"Error generating time response: {e}", "ERROR")
+        generated_text = gemini_client.generate(build_time_prompt(persona, random_time), deadline)
+        if generated_text:
+            store_time_response(persona, random_time, generated_text)
+            return generated_text
+        log_message("Error generating time response, using the plain time instead", "ERROR")
     
     # Fallback if persona processing fails or if no persona is specified
     return f"It's {random_time}."
 
-def generate_reply(prompt, prompt_language, use_google_ai=True, persona=None, conversation_history=None):
+def remember_generated_text(generated_text):
+    # Returns False when the AI produced exactly its previous reply again
     global last_generated_text
-    
+    if generated_text == last_generated_text:
+        return False
+    last_generated_text = generated_text
+    return True
+
+def generate_reply(prompt, prompt_language, use_google_ai=True, persona=None, conversation_history=None, deadline=None, prompt_lowered=None):
     # Check if it's a time-related question
-    if use_google_ai and is_time_question(prompt):
+    if use_google_ai and is_time_question(prompt, prompt_lowered):
         log_message(f"Detected time question: \"{prompt}\". Generating random time response.", "INFO")
-        return generate_random_time_response(prompt_language, persona)
+        return generate_random_time_response(prompt_language, persona, deadline)
     
     if use_google_ai:
-        google_api_key = get_random_api_key()
-        lang_prompt = generate_language_specific_prompt(prompt, prompt_language, persona, conversation_history)
-        if lang_prompt is None:
+        ai_prompt = build_ai_prompt(prompt, prompt_language, persona, conversation_history)
+        if ai_prompt is None:
             return None
-        # You can keep the instruction in Bahasa Indonesia while requesting English output
-        ai_prompt = f"{lang_prompt}\n\nBuatlah menjadi 1 kalimat dalam bahasa Inggris, menggunakan bahasa kasual chatting di discord tanpa huruf kapital"
-        url = f'https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent?key={google_api_key}'
-        headers = {'Content-Type': 'application/json'}
-        data = {'contents': [{'parts': [{'text': ai_prompt}]}]}
-        while True:
-            try:
-                response = requests.post(url, headers=headers, json=data)
-                if response.status_code == 429:
-                    log_message(f"API key {google_api_key} terkena rate limit (429). Menggunakan API key lain...", "WARNING")
-                    used_api_keys.add(google_api_key)
-                    return generate_reply(prompt, prompt_language, use_google_ai, persona, conversation_history)
-                response.raise_for_status()
-                result = response.json()
-                generated_text = result['candidates'][0]['content']['parts'][0]['text']
-                if generated_text == last_generated_text:
-                    log_message("AI menghasilkan teks yang sama, meminta teks baru...", "WAIT")
-                    continue
-                last_generated_text = generated_text
+        cached_text = cached_reply(ai_prompt, persona)
+        if cached_text:
+            return cached_text
+        # Bounded: a failed or repeated generation skips this message instead of stalling the channel
+        for _ in range(max_duplicate_retries + 1):
+            generated_text = gemini_client.generate(ai_prompt, deadline)
+            if generated_text is None:
+                return None
+            if remember_generated_text(generated_text):
+                store_reply(ai_prompt, persona, generated_text)
                 return generated_text
-            except requests.exceptions.RequestException as e:
-                log_message(f"Request failed: {e}", "ERROR")
-                time.sleep(2)
+            log_message("AI menghasilkan teks yang sama, meminta teks baru...", "WAIT")
+        return None
     else:
         return get_random_message_from_file()
 
+def fetch_discord_json(path, token, deadline=None):
+    def load():
+        response = discord_session(token).get(discord_url(path), timeout=deadline.timeout() if deadline else None)
+        response.raise_for_status()
+        return response.json()
+    # Keyed by token too, /users/@me and permissions differ per account
+    return discord_lookups.do((token, path), load)
+
+def fetch_channel(channel_id, token, deadline=None):
+    # Channel metadata is shared by get_channel_info and get_slow_mode_delay
+    return metadata_cache.get_or_load(("channel", channel_id), lambda: fetch_discord_json(f"/channels/{channel_id}", token, deadline))
+
+def fetch_guild(guild_id, token):
+    return metadata_cache.get_or_load(("guild", guild_id), lambda: fetch_discord_json(f"/guilds/{guild_id}", token))
+
 def get_channel_info(channel_id, token):
-    headers = {'Authorization': token}
-    channel_url = f"https://discord.com/api/v9/channels/{channel_id}"
     try:
-        channel_response = requests.get(channel_url, headers=headers)
-        channel_response.raise_for_status()
-        channel_data = channel_response.json()
+        channel_data = fetch_channel(channel_id, token)
         channel_name = channel_data.get('name', 'Unknown Channel')
         guild_id = channel_data.get('guild_id')
         server_name = "Direct Message"
         if guild_id:
-            guild_url = f"https://discord.com/api/v9/guilds/{guild_id}"
-            guild_response = requests.get(guild_url, headers=headers)
-            guild_response.raise_for_status()
-            guild_data = guild_response.json()
+            guild_data = fetch_guild(guild_id, token)
             server_name = guild_data.get('name', 'Unknown Server')
         return server_name, channel_name
     except requests.exceptions.RequestException as e:
@@ -249,11 +329,8 @@ def get_channel_info(channel_id, token):
         return "Unknown Server", "Unknown Channel"
 
 def get_bot_info(token):
-    headers = {'Authorization': token}
     try:
-        response = requests.get("https://discord.com/api/v9/users/@me", headers=headers)
-        response.raise_for_status()
-        data = response.json()
+        data = fetch_discord_json("/users/@me", token)
         username = data.get("username", "Unknown")
         discriminator = data.get("discriminator", "")
         bot_id = data.get("id", "Unknown")
@@ -262,195 +339,151 @@ def get_bot_info(token):
         log_message(f"Gagal mengambil info akun bot: {e}", "ERROR")
         return "Unknown", "", "Unknown"
 
-def is_valid_text_message(message_content):
-    # Function to check if a message contains only valid text content
-    # Filter out messages that contain links or are primarily emojis
-    
-    # Skip empty messages
-    if not message_content or not message_content.strip():
-        return False
-    
-    # Filter out URLs
-    url_pattern = r'https?://\S+|www\.\S+'
-    if re.search(url_pattern, message_content):
-        return False
-    
-    # Filter out messages that are primarily emoji
-    # This regex attempts to match common Unicode emoji patterns
-    emoji_pattern = re.compile(
-        "["
-        u"\U0001F600-\U0001F64F"  # emoticons
-        u"\U0001F300-\U0001F5FF"  # symbols & pictographs
-        u"\U0001F680-\U0001F6FF"  # transport & map symbols
-        u"\U0001F700-\U0001F77F"  # alchemical symbols
-        u"\U0001F780-\U0001F7FF"  # Geometric Shapes
-        u"\U0001F800-\U0001F8FF"  # Supplemental Arrows-C
-        u"\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
-        u"\U0001FA00-\U0001FA6F"  # Chess Symbols
-        u"\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
-        u"\U00002702-\U000027B0"  # Dingbats
-        u"\U000024C2-\U0001F251" 
-        "]+", flags=re.UNICODE)
-    
-    # Count emojis in the message
-    emoji_count = len(emoji_pattern.findall(message_content))
-    text_length = len(message_content)
-    
-    # If more than 30% of the message is emojis, skip it
-    if text_length > 0 and emoji_count / text_length > 0.3:
-        return False
-    
-    # Filter out Discord emoji format like <:emoji_name:id>
-    discord_emoji_pattern = r'<a?:[a-zA-Z0-9_]+:[0-9]+>'
-    if re.search(discord_emoji_pattern, message_content):
-        return False
-    
-    # Make sure the message has actual words (at least a few characters that aren't just symbols)
-    if not re.search(r'[a-zA-Z0-9]{3,}', message_content):
-        return False
-    
-    return True
-
-def should_process_message(message_data, bot_user_id):
-    """
-    Determines if a message should be processed based on comprehensive criteria:
-    - Ignores the bot's own messages
-    - Processes standalone messages with no mentions
-    - Processes replies to the bot's messages (for conversations)
-    - Ignores replies to other users' messages
-    - Ignores messages with mentions (except when replying to the bot)
-    
-    Returns True if the message should be processed, False otherwise
-    """
-    # Skip bot's own messages
-    author_id = message_data.get('author', {}).get('id')
-    if author_id == bot_user_id:
-        return False
-    
-    # Check if message is a reply
-    referenced_message = message_data.get('referenced_message')
-    message_reference = message_data.get('message_reference')
-    
-    # If it's a reply, check if it's replying to the bot
-    if referenced_message is not None or message_reference is not None:
-        # If we have the full referenced message object
-        if referenced_message is not None:
-            ref_author_id = referenced_message.get('author', {}).get('id')
-            # Only process if it's replying to our bot
-            return ref_author_id == bot_user_id
-        
-        # If we only have message_reference but not the full referenced message
-        # We can't determine who it's replying to, so let's skip to be safe
-        return False
-    
-    # Check for mentions in the message content
-    content = message_data.get('content', '')
-    mention_pattern = r'<@!?[0-9]+>'
-    if re.search(mention_pattern, content):
-        # Check if the only mention is to our bot
-        mentions = re.findall(mention_pattern, content)
-        if len(mentions) == 1:
-            # Extract the user ID from the mention
-            mention_id = re.sub(r'[<@!>]', '', mentions[0])
-            return mention_id == bot_user_id
-        return False
-    
-    # Check for mentions array in the message
-    mentions = message_data.get('mentions', [])
-    if mentions:
-        # If there's only one mention and it's our bot
-        if len(mentions) == 1 and mentions[0].get('id') == bot_user_id:
-            return True
-        return False
-    
-    # If it's a standalone message with no mentions, process it
-    return True
-
-def score_message_relevance(message, bot_user_id):
+def score_message_relevance(message, message_class):
     """Score a message for relevance, with higher scores indicating higher relevance."""
     score = 0
     
     # Direct replies to the bot get highest priority
-    referenced_message = message.get('referenced_message')
-    if referenced_message and referenced_message.get('author', {}).get('id') == bot_user_id:
+    if message_class.reply_to_bot:
         score += 10
     
     # Messages that mention the bot get high priority
-    if any(mention.get('id') == bot_user_id for mention in message.get('mentions', [])):
+    if message_class.mentions_bot:
         score += 8
     
     # Messages with question marks are likely questions
-    if '?' in message.get('content', ''):
+    if '?' in message.content:
         score += 5
     
     # Longer messages might have more substance
-    content_length = len(message.get('content', ''))
+    content_length = len(message.content)
     if content_length > 20:
         score += 3
     elif content_length > 10:
         score += 1
     
     # Check for keywords that might indicate the message is important
-    keywords = ["help", "question", "please", "thanks", "thank you", "tolong", "bantuan", "terima kasih"]
-    content = message.get('content', '').lower()
-    for keyword in keywords:
-        if keyword in content:
-            score += 2
-            break
+    if "relevance" in keyword_tags(message.lowered):
+        score += 2
     
     return score
 
-def auto_reply(channel_id, settings, token):
-    headers = {'Authorization': token}
+def select_relevant_message(messages, bot_user_id, channel_id):
+    # Find the most relevant unprocessed message, returns (message, score)
+    highest_score = -1
+    relevant_message = None
+    
+    for message in messages:
+        if message.id in processed_message_ids:
+            continue
+        # One classifier pass decides mention/reply status and text validity, scoring reuses it
+        message_class = classify_message(message, bot_user_id)
+        if message_class.is_valid:
+            relevance_score = score_message_relevance(message, message_class)
+            log_message(f"[Channel {channel_id}] Message: '{message.content}' has relevance score: {relevance_score}", "INFO")
+            if relevance_score > highest_score:
+                highest_score = relevance_score
+                relevant_message = message
+    
+    return relevant_message, highest_score
+
+def messages_path(channel_id, after=None):
+    # Without a cursor read the latest messages, afterwards only the ones newer than the cursor
+    path = f"/channels/{channel_id}/messages?limit={fetch_limit}"
+    if after:
+        path += f"&after={after}"
+    return path
+
+def max_poll_interval(settings):
+    return settings.get("max_delay_interval") or settings["delay_interval"] * idle_max_factor
+
+def next_poll_interval(channel_id, settings, messages, bot_user_id):
+    """Interval before the next poll, `messages` is None when the fetch failed (interval unchanged)."""
+    base = settings["delay_interval"]
+    if messages is None:
+        return poll_intervals.current(channel_id, base)
+    # The bot's own replies coming back in the next fetch are not activity
+    active = any(message.author_id != bot_user_id for message in messages)
+    backoff = settings.get("idle_backoff") or idle_backoff
+    return poll_intervals.update(channel_id, base, max_poll_interval(settings), backoff, active)
+
+def log_poll_wait(channel_id, settings, interval):
+    idle = " (channel sepi, interval diperpanjang)" if interval > settings["delay_interval"] else ""
+    log_message(f"[Channel {channel_id}] Menunggu {interval:g} detik sebelum iterasi berikutnya...{idle}", "WAIT")
+
+def page_overflowed(messages, after):
+    # `after=` returns the oldest messages after the cursor, a full page means more arrived than one poll reads
+    return after is not None and len(messages) >= fetch_limit
+
+def newer_than(messages, after):
+    after_key = snowflake_key(after)
+    return [message for message in messages if snowflake_key(message.get('id')) > after_key]
+
+def fetch_messages(session, channel_id, after, deadline):
+    """New messages since the cursor as ParsedMessage records, never older than the latest page."""
+    response = session.get(discord_url(messages_path(channel_id, after)), timeout=deadline.timeout())
+    response.raise_for_status()
+    messages = response.json()
+    if page_overflowed(messages, after):
+        # Same as without a cursor: answer from the latest page and let the backlog go
+        log_message(f"[Channel {channel_id}] Lebih dari {fetch_limit} pesan baru, membaca halaman terbaru saja.", "INFO")
+        response = session.get(discord_url(messages_path(channel_id)), timeout=deadline.timeout())
+        response.raise_for_status()
+        messages = newer_than(response.json(), after)
+    return [parse_message(message) for message in messages]
+
+def wait_for_send_slot(channel_id, slow_mode_delay):
+    # Sleep only for what is left of slow mode since the bot's last message in this channel
+    remaining = send_clock.remaining_wait(channel_id, slow_mode_delay)
+    if remaining > 0:
+        log_message(f"[Channel {channel_id}] Slow mode aktif, menunggu {remaining:.1f} detik lagi...", "WAIT")
+        time.sleep(remaining)
+    return remaining
+
+def auto_reply(channel_id, settings, token, bot_user_id=None):
+    session = discord_session(token)
+    labels = metric_labels(channel_id, token)
     if settings["use_google_ai"]:
-        try:
-            bot_info_response = requests.get('https://discord.com/api/v9/users/@me', headers=headers)
-            bot_info_response.raise_for_status()
-            bot_user_id = bot_info_response.json().get('id')
-        except requests.exceptions.RequestException as e:
-            log_message(f"[Channel {channel_id}] Gagal mengambil info bot: {e}", "ERROR")
-            return
+        # The bot ID is normally resolved once at startup, only fetch it when that failed
+        if bot_user_id is None:
+            try:
+                bot_user_id = fetch_discord_json("/users/@me", token).get('id')
+            except requests.exceptions.RequestException as e:
+                log_message(f"[Channel {channel_id}] Gagal mengambil info bot: {e}", "ERROR")
+                return
 
         while True:
             prompt = None
             reply_to_id = None
             relevant_message = None  # Store the most relevant message
+            slow_mode_delay = 0
+            messages = None
             
             log_message(f"[Channel {channel_id}] Menunggu {settings['read_delay']} detik sebelum membaca pesan...", "WAIT")
             time.sleep(settings["read_delay"])
+            deadline = new_deadline()
             try:
                 # Request multiple messages (10) instead of just the most recent one
-                response = requests.get(f'https://discord.com/api/v9/channels/{channel_id}/messages?limit=10', headers=headers)
-                response.raise_for_status()
-                messages = response.json()
+                with timed_stage("fetch", labels, deadline) as fetch_deadline:
+                    messages = fetch_messages(session, channel_id, channel_cursors.get(channel_id), fetch_deadline)
+                channel_cursors.advance(channel_id, messages)
+                send_clock.observe_messages(channel_id, messages, bot_user_id)
                 
                 if messages:
                     # Find the most relevant message
-                    highest_score = -1
-                    
-                    for message in messages:
-                        message_id = message.get('id')
-                        if message_id not in processed_message_ids and should_process_message(message, bot_user_id):
-                            user_message = message.get('content', '').strip()
-                            attachments = message.get('attachments', [])
-                            
-                            if not attachments and is_valid_text_message(user_message):
-                                relevance_score = score_message_relevance(message, bot_user_id)
-                                log_message(f"[Channel {channel_id}] Message: '{user_message}' has relevance score: {relevance_score}", "INFO")
-                                if relevance_score > highest_score:
-                                    highest_score = relevance_score
-                                    relevant_message = message
+                    with timed_stage("classify", labels):
+                        relevant_message, highest_score = select_relevant_message(messages, bot_user_id, channel_id)
                     
                     if relevant_message:
-                        message_id = relevant_message.get('id')
-                        user_message = relevant_message.get('content', '').strip()
+                        message_id = relevant_message.id
+                        user_message = relevant_message.content
                         
                         log_message(f"[Channel {channel_id}] Selected most relevant message: '{user_message}' (Score: {highest_score})", "INFO")
                         
+                        # Only look up the delay here, the wait itself overlaps with generating the reply
                         if settings["use_slow_mode"]:
-                            slow_mode_delay = get_slow_mode_delay(channel_id, token)
-                            log_message(f"[Channel {channel_id}] Slow mode aktif, menunggu {slow_mode_delay} detik...", "WAIT")
-                            time.sleep(slow_mode_delay)
+                            # A cache miss is a Discord call inside the iteration, it gets a fetch share too
+                            slow_mode_delay = get_slow_mode_delay(channel_id, token, deadline.split(stage_shares["fetch"]))
                         
                         prompt = user_message
                         reply_to_id = message_id
@@ -459,39 +492,46 @@ def auto_reply(channel_id, settings, token):
                     prompt = None
             except requests.exceptions.RequestException as e:
                 log_message(f"[Channel {channel_id}] Request error: {e}", "ERROR")
+                stage_errors.inc(stage="fetch", **labels)
                 prompt = None
 
             if prompt and relevant_message:
                 # Get the user ID from the selected message
-                user_id = relevant_message.get('author', {}).get('id')
+                user_id = relevant_message.author_id
                 
                 # Get conversation history for this user
                 conversation_history = get_conversation_history(user_id, channel_id)
                 
                 # Generate reply with conversation history
-                result = generate_reply(prompt, settings["prompt_language"], settings["use_google_ai"], settings.get("persona"), conversation_history)
+                with timed_stage("generate", labels, deadline) as generate_deadline:
+                    result = generate_reply(prompt, settings["prompt_language"], settings["use_google_ai"], settings.get("persona"), conversation_history, generate_deadline,
+                                            relevant_message.lowered)
                 
                 if result is None:
-                    log_message(f"[Channel {channel_id}] Bahasa prompt tidak valid. Pesan dilewati.", "WARNING")
+                    log_message(f"[Channel {channel_id}] Tidak ada balasan dari AI. Pesan dilewati.", "WARNING")
+                    stage_errors.inc(stage="generate", **labels)
                 else:
                     response_text = result if result else "Sorry, I couldn't reply to your message."
-                    if response_text.strip().lower() == prompt.strip().lower():
+                    if response_text.strip().lower() == relevant_message.lowered:
                         log_message(f"[Channel {channel_id}] Balasan sama dengan pesan yang diterima. Tidak mengirim balasan.", "WARNING")
                     else:
+                        deadline.pause(wait_for_send_slot(channel_id, slow_mode_delay))
                         if settings["use_reply"]:
                             send_message(channel_id, response_text, token, reply_to=reply_to_id, 
-                                         delete_after=settings["delete_bot_reply"], delete_immediately=settings["delete_immediately"])
+                                         delete_after=settings["delete_bot_reply"], delete_immediately=settings["delete_immediately"], deadline=deadline)
                         else:
                             send_message(channel_id, response_text, token, 
-                                         delete_after=settings["delete_bot_reply"], delete_immediately=settings["delete_immediately"])
+                                         delete_after=settings["delete_bot_reply"], delete_immediately=settings["delete_immediately"], deadline=deadline)
                         
                         # Update conversation history after successful reply
                         update_conversation_history(user_id, channel_id, prompt, response_text)
             else:
                 log_message(f"[Channel {channel_id}] Tidak ada pesan baru atau pesan tidak valid.", "INFO")
+            report_overrun("iteration", labels, deadline)
 
-            log_message(f"[Channel {channel_id}] Menunggu {settings['delay_interval']} detik sebelum iterasi berikutnya...", "WAIT")
-            time.sleep(settings["delay_interval"])
+            interval = next_poll_interval(channel_id, settings, messages, bot_user_id)
+            log_poll_wait(channel_id, settings, interval)
+            time.sleep(interval)
     else:
         while True:
             delay = settings["delay_interval"]
@@ -503,56 +543,62 @@ def auto_reply(channel_id, settings, token):
             else:
                 send_message(channel_id, message_text, token, delete_after=settings["delete_bot_reply"], delete_immediately=settings["delete_immediately"])
 
-def send_message(channel_id, message_text, token, reply_to=None, delete_after=None, delete_immediately=False):
-    headers = {'Authorization': token, 'Content-Type': 'application/json'}
+def send_message(channel_id, message_text, token, reply_to=None, delete_after=None, delete_immediately=False, deadline=None):
     payload = {'content': message_text}
     if reply_to:
         payload["message_reference"] = {"message_id": reply_to}
-    url = f"https://discord.com/api/v9/channels/{channel_id}/messages"
+    url = discord_url(f"/channels/{channel_id}/messages")
+    send_deadline = (deadline or new_deadline()).split(stage_shares["send"])
+    started = time.perf_counter()
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = discord_session(token).post(url, json=payload, timeout=send_deadline.timeout())
         response.raise_for_status()
         if response.status_code in [200, 201]:
             data = response.json()
             message_id = data.get("id")
+            send_clock.record_send(channel_id)
             log_message(f"[Channel {channel_id}] Pesan terkirim: \"{message_text}\" (ID: {message_id})", "SUCCESS")
             if delete_after is not None:
                 if delete_immediately:
                     log_message(f"[Channel {channel_id}] Menghapus pesan segera tanpa delay...", "WAIT")
-                    threading.Thread(target=delete_message, args=(channel_id, message_id, token), daemon=True).start()
+                    delete_scheduler.schedule(channel_id, message_id, token)
                 elif delete_after > 0:
                     log_message(f"[Channel {channel_id}] Pesan akan dihapus dalam {delete_after} detik...", "WAIT")
-                    threading.Thread(target=delayed_delete, args=(channel_id, message_id, delete_after, token), daemon=True).start()
+                    delete_scheduler.schedule(channel_id, message_id, token, delay=delete_after)
         else:
             log_message(f"[Channel {channel_id}] Gagal mengirim pesan. Status: {response.status_code}", "ERROR")
             log_message(f"[Channel {channel_id}] Respons API: {response.text}", "ERROR")
+            stage_errors.inc(stage="send", **metric_labels(channel_id, token))
     except requests.exceptions.RequestException as e:
         log_message(f"[Channel {channel_id}] Kesalahan saat mengirim pesan: {e}", "ERROR")
-
-def delayed_delete(channel_id, message_id, delay, token):
-    time.sleep(delay)
-    delete_message(channel_id, message_id, token)
+        stage_errors.inc(stage="send", **metric_labels(channel_id, token))
+    finally:
+        observe_stage("send", metric_labels(channel_id, token), time.perf_counter() - started, send_deadline)
 
 def delete_message(channel_id, message_id, token):
-    headers = {'Authorization': token, 'Content-Type': 'application/json'}
-    url = f'https://discord.com/api/v9/channels/{channel_id}/messages/{message_id}'
+    url = discord_url(f"/channels/{channel_id}/messages/{message_id}")
+    delete_deadline = new_deadline().split(stage_shares["delete"])
+    started = time.perf_counter()
     try:
-        response = requests.delete(url, headers=headers)
+        response = discord_session(token).delete(url, timeout=delete_deadline.timeout())
         if response.status_code == 204:
             log_message(f"[Channel {channel_id}] Pesan dengan ID {message_id} berhasil dihapus.", "SUCCESS")
         else:
             log_message(f"[Channel {channel_id}] Gagal menghapus pesan. Status: {response.status_code}", "ERROR")
             log_message(f"[Channel {channel_id}] Respons API: {response.text}", "ERROR")
+            stage_errors.inc(stage="delete", **metric_labels(channel_id, token))
     except requests.exceptions.RequestException as e:
         log_message(f"[Channel {channel_id}] Kesalahan saat menghapus pesan: {e}", "ERROR")
+        stage_errors.inc(stage="delete", **metric_labels(channel_id, token))
+    finally:
+        observe_stage("delete", metric_labels(channel_id, token), time.perf_counter() - started, delete_deadline)
+
+# All scheduled deletes share one worker thread instead of one sleeping thread each
+delete_scheduler = DeleteScheduler(delete_message, log_func=log_message)
 
-def get_slow_mode_delay(channel_id, token):
-    headers = {'Authorization': token, 'Accept': 'application/json'}
-    url = f"https://discord.com/api/v9/channels/{channel_id}"
+def get_slow_mode_delay(channel_id, token, deadline=None):
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
+        data = fetch_channel(channel_id, token, deadline)
         slow_mode_delay = data.get("rate_limit_per_user", 0)
         log_message(f"[Channel {channel_id}] Slow mode delay: {slow_mode_delay} detik", "INFO")
         return slow_mode_delay
@@ -560,6 +606,105 @@ def get_slow_mode_delay(channel_id, token):
         log_message(f"[Channel {channel_id}] Gagal mengambil informasi slow mode: {e}", "ERROR")
         return 5
 
+def metric_labels(channel_id, token):
+    return {"channel": channel_id, "token": token_indexes.get(token, "?")}
+
+def new_deadline():
+    return Deadline(iteration_budget, connect_timeout=connect_timeout)
+
+def report_overrun(stage, labels, deadline):
+    overrun = deadline.overrun()
+    if overrun > 0:
+        deadline_overruns.inc(stage=stage, **labels)
+        log_message(f"[Channel {labels['channel']}] Tahap {stage} melewati anggaran waktu {deadline.budget:.1f} detik (+{overrun:.1f} detik)", "WARNING")
+
+def observe_stage(stage, labels, elapsed, deadline=None):
+    stage_seconds.observe(elapsed, stage=stage, **labels)
+    if deadline is not None:
+        report_overrun(stage, labels, deadline)
+
+@contextmanager
+def timed_stage(stage, labels, deadline=None):
+    # Records the stage duration and yields its share of the iteration deadline
+    stage_deadline = deadline.split(stage_shares[stage]) if deadline is not None else None
+    started = time.perf_counter()
+    try:
+        yield stage_deadline
+    finally:
+        observe_stage(stage, labels, time.perf_counter() - started, stage_deadline)
+
+def observe_http(api, method, status, seconds):
+    http_seconds.observe(seconds, api=api, method=method, status=status)
+    if status == 429:
+        rate_limited.inc(api=api)
+
+def record_http_response(api, response):
+    observe_http(api, response.request.method, response.status_code, response.elapsed.total_seconds())
+
+add_response_hook(record_http_response)
+
+def cache_hit_rates():
+    keyword_info = keyword_tags.cache_info()
+    keyword_lookups = keyword_info.hits + keyword_info.misses
+    rates = {
+        ("metadata",): metadata_cache.stats()["hit_rate"],
+        ("keyword_tags",): keyword_info.hits / keyword_lookups if keyword_lookups else 0.0,
+    }
+    if response_cache is not None:
+        rates[("response",)] = response_cache.stats()["hit_rate"]
+    return rates
+
+def queue_depths():
+    depths = {("delete",): delete_scheduler.queue_depth(), ("log",): logger.queue_depth()}
+    if state_store:
+        depths[("state_writes",)] = state_store.pending_writes()
+    return depths
+
+metrics.callback_gauge("bot_cache_hit_rate", "Hit rate of each in-process cache", ("cache",), cache_hit_rates)
+metrics.callback_gauge("bot_queue_depth", "Items waiting in each background queue", ("queue",), queue_depths)
+metrics.callback_counter("bot_log_records_dropped_total", "Log records dropped because the log queue was full", (),
+                         lambda: {(): logger.dropped})
+metrics.callback_gauge("bot_gemini_keys", "Gemini API keys per circuit breaker state", ("state",),
+                       lambda: {(state,): count for state, count in gemini_key_pool.stats().items() if state != "keys"})
+
+def discord_buckets(field):
+    # field 3 = remaining, 4 = seconds until reset, see DiscordRateLimiter.snapshot
+    return {(token_indexes.get(entry[0], "?"), entry[1]): entry[field] for entry in discord_limiter.snapshot()}
+
+metrics.callback_gauge("bot_discord_bucket_remaining", "Requests left in each Discord rate limit bucket", ("token", "bucket"),
+                       lambda: discord_buckets(3))
+metrics.callback_gauge("bot_discord_bucket_reset_seconds", "Seconds until each Discord rate limit bucket resets", ("token", "bucket"),
+                       lambda: discord_buckets(4))
+metrics.callback_counter("bot_discord_limiter_events_total", "Requests held back or retried by the Discord rate limiter", ("event",),
+                         lambda: {("waits",): discord_limiter.waits, ("retries",): discord_limiter.retries})
+
+def single_flight_shares():
+    shares = {(name,): flight.shared for name, flight in single_flights.items()}
+    shares[("metadata",)] = metadata_cache.stats()["shared_loads"]
+    return shares
+
+metrics.callback_counter("bot_single_flight_shared_total", "Calls answered by an identical request already in flight", ("lookup",),
+                         single_flight_shares)
+
+metrics.callback_gauge("bot_poll_interval_seconds", "Current poll interval of each channel", ("channel",),
+                       lambda: {(channel_id,): interval for channel_id, interval in poll_intervals.items()})
+
+def start_metrics():
+    if metrics_port:
+        start_http_server(metrics, int(metrics_port))
+        log_message(f"Metrics tersedia di http://127.0.0.1:{metrics_port}/metrics", "SUCCESS")
+    if metrics_json_path:
+        start_snapshot_writer(metrics, metrics_json_path, metrics_json_interval)
+        log_message(f"Snapshot metrics ditulis ke {metrics_json_path} setiap {metrics_json_interval} detik", "INFO")
+
+def start_profiling(directory):
+    global profiler
+    profiler = SamplingProfiler(directory, interval=profile_interval, sample_interval=profile_sample_interval,
+                                keep=profile_keep, trace_frames=profile_trace_frames, log_func=log_message)
+    profiler.start()
+    atexit.register(profiler.stop)  # Registered after logger.close, so it still runs before it
+    log_message(f"Profiling aktif: dump ke {directory} setiap {profile_interval:g} detik", "WARNING")
+
 def start_cleanup_thread():
     def periodic_cleanup():
         while True:
@@ -570,7 +715,15 @@ def start_cleanup_thread():
     cleanup_thread = threading.Thread(target=periodic_cleanup, daemon=True)
     cleanup_thread.start()
 
+def resolve_concurrently(func, items, *args):
+    # Runs func(item, *args) for every item on a bounded pool, results keep the input order
+    if not items:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(startup_workers, len(items))) as executor:
+        return dict(zip(items, executor.map(lambda item: func(item, *args), items)))
+
 def get_server_settings(channel_id, channel_name):
+    logger.flush()  # Pending log lines must not interleave with the prompts
     print(f"\nMasukkan pengaturan untuk channel {channel_id} (Nama Channel: {channel_name}):")
     use_google_ai = input("  Gunakan Google Gemini AI? (y/n): ").strip().lower() == 'y'
     
@@ -617,26 +770,41 @@ def get_server_settings(channel_id, channel_name):
     }
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Discord auto reply bot")
+    parser.add_argument("--config", default=os.getenv('CHANNEL_CONFIG', '').strip() or None,
+                        help="JSON/TOML file with channel settings, skips the interactive questions")
+    parser.add_argument("--profile", metavar="DIR", default=os.getenv('PROFILE_DIR', '').strip() or None,
+                        help="write periodic stack sample and allocation profiles to DIR")
+    args = parser.parse_args()
+
+    # A broken config should fail before any network call or prompt
+    channel_ids, server_settings = load_channel_config(args.config) if args.config else (None, None)
+    if args.profile:
+        start_profiling(args.profile)
+
     bot_accounts = {}
-    for token in discord_tokens:
-        username, discriminator, bot_id = get_bot_info(token)
+    for token, (username, discriminator, bot_id) in resolve_concurrently(get_bot_info, discord_tokens).items():
         bot_accounts[token] = {"username": username, "discriminator": discriminator, "bot_id": bot_id}
         log_message(f"Akun Bot: {username}#{discriminator} (ID: {bot_id})", "SUCCESS")
 
-    # Input channel IDs dari user
-    channel_ids = [cid.strip() for cid in input("Masukkan ID channel (pisahkan dengan koma jika lebih dari satu): ").split(",") if cid.strip()]
+    if channel_ids is None:
+        # Input channel IDs dari user
+        logger.flush()
+        channel_ids = [cid.strip() for cid in input("Masukkan ID channel (pisahkan dengan koma jika lebih dari satu): ").split(",") if cid.strip()]
+    else:
+        log_message(f"Pengaturan {len(channel_ids)} channel dimuat dari {args.config}", "SUCCESS")
 
     token = discord_tokens[0]
     channel_infos = {}
-    for channel_id in channel_ids:
-        server_name, channel_name = get_channel_info(channel_id, token)
+    for channel_id, (server_name, channel_name) in resolve_concurrently(get_channel_info, channel_ids, token).items():
         channel_infos[channel_id] = {"server_name": server_name, "channel_name": channel_name}
         log_message(f"[Channel {channel_id}] Terhubung ke server: {server_name} | Nama Channel: {channel_name}", "SUCCESS")
 
-    server_settings = {}
-    for channel_id in channel_ids:
-        channel_name = channel_infos.get(channel_id, {}).get("channel_name", "Unknown Channel")
-        server_settings[channel_id] = get_server_settings(channel_id, channel_name)
+    if server_settings is None:
+        server_settings = {}
+        for channel_id in channel_ids:
+            channel_name = channel_infos.get(channel_id, {}).get("channel_name", "Unknown Channel")
+            server_settings[channel_id] = get_server_settings(channel_id, channel_name)
 
     for cid, settings in server_settings.items():
         info = channel_infos.get(cid, {"server_name": "Unknown Server", "channel_name": "Unknown Channel"})
@@ -650,37 +818,62 @@ if __name__ == "__main__":
             f"Bahasa = {settings['prompt_language'].upper()}, "
             f"Membaca Pesan = {'Aktif' if settings['enable_read_message'] else 'Tidak'}, "
             f"Delay Membaca = {settings['read_delay']} detik, "
-            f"Interval = {settings['delay_interval']} detik, "
+            f"Interval = {settings['delay_interval']} detik"
+            f"{f' (maks {max_poll_interval(settings):g} detik saat sepi)' if settings['use_google_ai'] else ''}, "
             f"Slow Mode = {'Aktif' if settings['use_slow_mode'] else 'Tidak'}, "
             f"Reply = {'Ya' if settings['use_reply'] else 'Tidak'}, "
             f"Hapus Pesan = {hapus_str}",
             "INFO"
         )
 
-    # Start the conversation cleanup thread
-    start_cleanup_thread()
-    log_message("Started conversation cleanup thread to manage memory", "SUCCESS")
-    
     # Print the conversation memory settings
     log_message(f"Conversation memory settings: Max length = {max_conversation_length}, Expiry = {conversation_expiry/60} minutes", "INFO")
     
     # Print language and multi-message processing information
-    log_message("Enhanced message selection enabled: Bot will analyze the last 10 messages and respond to the most relevant one", "INFO")
+    log_message(f"Enhanced message selection enabled: Bot will analyze up to {fetch_limit} new messages per poll and respond to the most relevant one", "INFO")
     log_message("English-only mode enabled: Bot will always respond in English regardless of input language", "INFO")
 
-    token_index = 0
-    for channel_id in channel_ids:
-        token = discord_tokens[token_index % len(discord_tokens)]
-        token_index += 1
+    # Identities resolved above are handed to the channel loops so nothing is fetched twice
+    bot_user_ids = {token: info["bot_id"] for token, info in bot_accounts.items() if info["bot_id"] != "Unknown"}
+
+    channel_tokens = {}
+    for token_index, channel_id in enumerate(channel_ids):
+        channel_tokens[channel_id] = discord_tokens[token_index % len(discord_tokens)]
+
+    for channel_id, token in channel_tokens.items():
         bot_info = bot_accounts.get(token, {"username": "Unknown", "discriminator": "", "bot_id": "Unknown"})
-        thread = threading.Thread(
-            target=auto_reply,
-            args=(channel_id, server_settings[channel_id], token)
-        )
-        thread.daemon = True
-        thread.start()
         log_message(f"[Channel {channel_id}] Bot aktif: {bot_info['username']}#{bot_info['discriminator']} (Token: {token[:4]}{'...' if len(token) > 4 else token})", "SUCCESS")
 
     log_message("Bot sedang berjalan di beberapa server... Tekan CTRL+C untuk menghentikan.", "INFO")
-    while True:
-        time.sleep(10)
+    start_metrics()
+    try:
+        if bot_engine == "asyncio":
+            # Make `import bot` inside async_engine resolve to this module instead of re-running it
+            sys.modules.setdefault("bot", sys.modules[__name__])
+            import async_engine
+            log_message("Asyncio engine aktif: semua channel berjalan di satu event loop", "INFO")
+            async_engine.run(channel_tokens, server_settings, bot_user_ids)
+        else:
+            # Start the conversation cleanup thread
+            start_cleanup_thread()
+            log_message("Started conversation cleanup thread to manage memory", "SUCCESS")
+
+            for channel_id, token in channel_tokens.items():
+                thread = threading.Thread(
+                    target=auto_reply,
+                    args=(channel_id, server_settings[channel_id], token, bot_user_ids.get(token)),
+                    name=f"channel-{channel_id}"  # Profiles are attributed by thread name
+                )
+                thread.daemon = True
+                thread.start()
+
+            while True:
+                time.sleep(10)
+    except KeyboardInterrupt:
+        if delete_scheduler.queue_depth():
+            log_message(f"{delete_scheduler.queue_depth()} pesan terjadwal belum dihapus.", "WARNING")
+        delete_scheduler.stop()
+        if state_store:
+            state_store.close()
+        close_all_sessions()
+        log_message("Bot dihentikan.", "INFO")
@@ -0,0 +1,136 @@
+"""
+Channel settings from a JSON or TOML file instead of the interactive prompts.
+
+    [defaults]
+    use_google_ai = true
+    read_delay = 5
+    delay_interval = 30
+
+    [channels."123456789012345678"]
+    persona = "a medieval knight"
+    use_reply = false
+
+Every channel gets the defaults with its own table on top. The result has the
+same shape as get_server_settings() in bot.py.
+"""
+import json
+import os
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# key -> (accepted types, check, description)
+OPTIONS = {
+    "use_google_ai": ((bool,), None, "true/false"),
+    "persona": ((str, type(None)), None, "teks"),
+    "read_delay": ((int,), lambda value: value >= 0, "bilangan bulat >= 0"),
+    "delay_interval": ((int, float), lambda value: value > 0, "angka > 0"),
+    "max_delay_interval": ((int, float, type(None)), lambda value: value is None or value > 0, "angka > 0"),
+    "idle_backoff": ((int, float, type(None)), lambda value: value is None or value >= 1, "angka >= 1"),
+    "use_slow_mode": ((bool,), None, "true/false"),
+    "use_reply": ((bool,), None, "true/false"),
+    "delete_bot_reply": ((int, type(None)), lambda value: value is None or value >= 0, "bilangan bulat >= 0"),
+    "delete_immediately": ((bool,), None, "true/false"),
+}
+
+DEFAULTS = {
+    "use_google_ai": True,
+    "persona": None,
+    "read_delay": 5,
+    "delay_interval": 30,
+    "max_delay_interval": None,  # None: delay_interval * IDLE_MAX_FACTOR
+    "idle_backoff": None,  # None: IDLE_BACKOFF
+    "use_slow_mode": False,
+    "use_reply": True,
+    "delete_bot_reply": None,
+    "delete_immediately": False,
+}
+
+def read_config_file(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".toml":
+        if tomllib is None:
+            raise ValueError("Config TOML membutuhkan Python 3.11+ atau: pip install tomli")
+        with open(path, "rb") as file:
+            return tomllib.load(file)
+    if extension == ".json":
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    raise ValueError(f"Format config tidak dikenal: {path} (gunakan .json atau .toml)")
+
+def validate_options(options, where, errors):
+    if not isinstance(options, dict):
+        errors.append(f"{where}: harus berupa tabel/objek")
+        return {}
+    for key, value in options.items():
+        if key not in OPTIONS:
+            errors.append(f"{where}: opsi tidak dikenal '{key}'")
+            continue
+        types, check, description = OPTIONS[key]
+        # bool is an int subclass, but `read_delay = true` is a typo, not a delay
+        if not isinstance(value, types) or (isinstance(value, bool) and bool not in types) or (check and not check(value)):
+            errors.append(f"{where}: '{key}' harus {description}, bukan {value!r}")
+    return options
+
+def build_settings(options):
+    use_google_ai = options["use_google_ai"]
+    return {
+        "prompt_language": "en",  # Always English, same as the interactive setup
+        "use_google_ai": use_google_ai,
+        "enable_read_message": use_google_ai,
+        "read_delay": options["read_delay"] if use_google_ai else 0,
+        "delay_interval": options["delay_interval"],
+        "max_delay_interval": options["max_delay_interval"],
+        "idle_backoff": options["idle_backoff"],
+        "use_slow_mode": options["use_slow_mode"] if use_google_ai else False,
+        "use_reply": options["use_reply"],
+        "delete_bot_reply": options["delete_bot_reply"],
+        "delete_immediately": options["delete_immediately"] if options["delete_bot_reply"] is not None else False,
+        "persona": (options["persona"] or None) if use_google_ai else None,
+    }
+
+def load_channel_config(path):
+    """
+    Reads and validates the whole file before anything starts. Returns
+    (channel_ids in file order, {channel_id: settings}). Raises ValueError
+    listing every problem at once.
+    """
+    try:
+        data = read_config_file(path)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Gagal membaca config {path}: {e}") from e
+
+    errors = []
+    if not isinstance(data, dict):
+        raise ValueError(f"Config {path}: isi file harus berupa tabel/objek")
+    for key in data:
+        if key not in ("defaults", "channels"):
+            errors.append(f"bagian tidak dikenal '{key}' (gunakan 'defaults' dan 'channels')")
+    defaults = dict(DEFAULTS)
+    defaults.update(validate_options(data.get("defaults", {}), "defaults", errors))
+
+    channels = data.get("channels")
+    if not isinstance(channels, dict) or not channels:
+        errors.append("'channels' harus berisi minimal satu channel ID")
+        channels = {}
+
+    channel_ids = []
+    server_settings = {}
+    for channel_id, overrides in channels.items():
+        channel_id = str(channel_id).strip()
+        if not channel_id.isdigit():
+            errors.append(f"channel '{channel_id}': ID channel harus berupa angka")
+            continue
+        options = dict(defaults)
+        options.update(validate_options(overrides if overrides is not None else {}, f"channel {channel_id}", errors))
+        channel_ids.append(channel_id)
+        server_settings[channel_id] = build_settings(options)
+
+    if errors:
+        raise ValueError(f"Config {path} tidak valid:\n  - " + "\n  - ".join(errors))
+    return channel_ids, server_settings
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict
+
+def snowflake_key(message_id):
+    # Discord snowflakes grow with time, compare them numerically
+    try:
+        return int(message_id)
+    except (TypeError, ValueError):
+        return 0
+
+class RecentIdSet:
+    """Thread-safe set that only remembers the most recent `maxlen` IDs."""
+
+    def __init__(self, maxlen=1000):
+        self.maxlen = maxlen
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, item):
+        with self._lock:
+            self._ids[item] = None
+            self._ids.move_to_end(item)
+            while len(self._ids) > self.maxlen:
+                self._ids.popitem(last=False)
+
+    def __contains__(self, item):
+        with self._lock:
+            return item in self._ids
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ids)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+class ChannelCursors:
+    """
+    High-water-mark snowflake per channel. Polls pass the cursor as `after=`
+    so every fetch only transfers messages newer than the last one seen.
+
+    `loader(channel_id)` is called the first time a channel is read and
+    `on_advance(channel_id, message_id)` whenever a cursor moves, which is how
+    a persistent state store is plugged in.
+    """
+
+    def __init__(self, loader=None, on_advance=None):
+        self.loader = loader
+        self.on_advance = on_advance
+        self._cursors = {}
+        self._loaded = set()
+        self._lock = threading.Lock()
+
+    def get(self, channel_id):
+        with self._lock:
+            if channel_id in self._loaded or self.loader is None:
+                return self._cursors.get(channel_id)
+        stored = self.loader(channel_id)
+        with self._lock:
+            self._loaded.add(channel_id)
+            if stored is not None and channel_id not in self._cursors:
+                self._cursors[channel_id] = stored
+            return self._cursors.get(channel_id)
+
+    def advance(self, channel_id, messages):
+        # Move the cursor to the newest message in the batch, never backwards
+        newest = max((message.id for message in messages), key=snowflake_key, default=None)
+        if newest is None:
+            return self.get(channel_id)
+        with self._lock:
+            current = self._cursors.get(channel_id)
+            moved = current is None or snowflake_key(newest) > snowflake_key(current)
+            if moved:
+                self._cursors[channel_id] = newest
+            cursor = self._cursors[channel_id]
+        if moved and self.on_advance is not None:
+            self.on_advance(channel_id, cursor)
+        return cursor
+
+    def items(self):
+        with self._lock:
+            return list(self._cursors.items())
+
+DISCORD_EPOCH = 1420070400  # First second of 2015, snowflake timestamps count from here
+
+def snowflake_time(message_id):
+    return ((snowflake_key(message_id) >> 22) / 1000) + DISCORD_EPOCH
+
+class SendClock:
+    """
+    Remembers when the bot last posted in each channel so slow mode only
+    waits for what is actually left of `rate_limit_per_user`. A channel the
+    bot hasn't posted in since start waits the whole delay.
+    """
+
+    def __init__(self):
+        self._last_sent = {}
+        self._lock = threading.Lock()
+
+    def record_send(self, channel_id, sent_at=None):
+        sent_at = time.time() if sent_at is None else sent_at
+        with self._lock:
+            if sent_at > self._last_sent.get(channel_id, 0):
+                self._last_sent[channel_id] = sent_at
+
+    def observe_messages(self, channel_id, messages, bot_user_id):
+        # The bot's own messages in a fetch tell us when it last posted, even after a restart
+        for message in messages:
+            if message.author_id == bot_user_id:
+                self.record_send(channel_id, snowflake_time(message.id))
+
+    def last_sent(self, channel_id):
+        with self._lock:
+            return self._last_sent.get(channel_id)
+
+    def remaining_wait(self, channel_id, slow_mode_delay):
+        if not slow_mode_delay:
+            return 0
+        last_sent = self.last_sent(channel_id)
+        if last_sent is None:
+            # Not seen since start (a stored cursor skips the bot's earlier messages), wait the full delay
+            return slow_mode_delay
+        return max(0, last_sent + slow_mode_delay - time.time())
+
+class PollIntervals:
+    """
+    Adaptive poll interval per channel. Every poll that brings nothing new
+    multiplies the wait by `backoff`, up to `maximum`; the first poll with new
+    messages goes straight back to the configured interval.
+    """
+
+    def __init__(self):
+        self._intervals = {}
+        self._lock = threading.Lock()
+
+    def update(self, channel_id, base, maximum, backoff, active):
+        with self._lock:
+            if active:
+                interval = base
+            else:
+                interval = min(max(maximum, base), self._intervals.get(channel_id, base) * backoff)
+            self._intervals[channel_id] = interval
+            return interval
+
+    def current(self, channel_id, base):
+        with self._lock:
+            return self._intervals.get(channel_id, base)
+
+    def items(self):
+        with self._lock:
+            return list(self._intervals.items())
@@ -0,0 +1,146 @@
+import re
+
+# All patterns are compiled once at import instead of on every message
+URL_PATTERN = r'https?://\S+|www\.\S+'
+DISCORD_EMOJI_PATTERN = r'<a?:[a-zA-Z0-9_]+:[0-9]+>'
+MENTION_PATTERN = r'<@!?([0-9]+)>'
+WORD_PATTERN = r'[a-zA-Z0-9]{3,}'
+EMOJI_PATTERN = (
+    "["
+    u"\U0001F600-\U0001F64F"  # emoticons
+    u"\U0001F300-\U0001F5FF"  # symbols & pictographs
+    u"\U0001F680-\U0001F6FF"  # transport & map symbols
+    u"\U0001F700-\U0001F77F"  # alchemical symbols
+    u"\U0001F780-\U0001F7FF"  # Geometric Shapes
+    u"\U0001F800-\U0001F8FF"  # Supplemental Arrows-C
+    u"\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
+    u"\U0001FA00-\U0001FA6F"  # Chess Symbols
+    u"\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
+    u"\U00002702-\U000027B0"  # Dingbats
+    u"\U000024C2-\U0001F251"
+    "]+"
+)
+
+URL_RE = re.compile(URL_PATTERN)
+DISCORD_EMOJI_RE = re.compile(DISCORD_EMOJI_PATTERN)
+MENTION_RE = re.compile(MENTION_PATTERN)
+WORD_RE = re.compile(WORD_PATTERN)
+EMOJI_RE = re.compile(EMOJI_PATTERN, flags=re.UNICODE)
+
+EMOJI_RATIO_LIMIT = 0.3  # More than 30% emoji runs per character is skipped
+
+def scan_content(content):
+    """
+    Returns (is_valid_text, mention_ids) for one message body.
+    Cheap substring checks gate every regex, so plain ASCII chat text
+    usually only runs the word search.
+    """
+    has_angle = '<' in content
+    mention_ids = MENTION_RE.findall(content) if has_angle else []
+
+    # Skip empty messages
+    if not content or not content.strip():
+        return False, mention_ids
+
+    # Filter out URLs
+    if ('http' in content or 'www.' in content) and URL_RE.search(content):
+        return False, mention_ids
+
+    # Filter out Discord emoji format like <:emoji_name:id>
+    if has_angle and DISCORD_EMOJI_RE.search(content):
+        return False, mention_ids
+
+    # Filter out messages that are primarily emoji, ASCII text can't contain any
+    if not content.isascii() and len(EMOJI_RE.findall(content)) / len(content) > EMOJI_RATIO_LIMIT:
+        return False, mention_ids
+
+    # Make sure the message has actual words (at least a few characters that aren't just symbols)
+    return WORD_RE.search(content) is not None, mention_ids
+
+class ParsedMessage:
+    """
+    The fields of a Discord message the bot looks at, read out of the JSON once
+    per fetch. Every later stage (classification, scoring, cursors, slow mode)
+    works on this instead of the nested dicts.
+    """
+    __slots__ = ("id", "author_id", "content", "lowered", "mention_ids", "is_reply", "reply_author_id", "has_attachments")
+
+    def __init__(self, id, author_id, content, lowered, mention_ids, is_reply, reply_author_id, has_attachments):
+        self.id = id
+        self.author_id = author_id
+        self.content = content  # Stripped
+        self.lowered = lowered
+        self.mention_ids = mention_ids  # From the `mentions` array, in order
+        self.is_reply = is_reply
+        self.reply_author_id = reply_author_id  # None when Discord didn't include the referenced message
+        self.has_attachments = has_attachments
+
+def parse_message(message_data):
+    get = message_data.get
+    content = (get('content') or '').strip()
+    author = get('author')
+    mentions = get('mentions')
+    referenced_message = get('referenced_message')
+    if referenced_message is not None:
+        is_reply = True
+        reply_author = referenced_message.get('author')
+        reply_author_id = reply_author.get('id') if reply_author else None
+    else:
+        is_reply = get('message_reference') is not None
+        reply_author_id = None
+    return ParsedMessage(
+        get('id'),
+        author.get('id') if author else None,
+        content,
+        content.lower(),
+        tuple([mention.get('id') for mention in mentions]) if mentions else (),
+        is_reply,
+        reply_author_id,
+        bool(get('attachments')),
+    )
+
+class MessageClass:
+    """Result of classify_message(): whether to consider the message, and what scoring needs to know."""
+    __slots__ = ("is_valid", "reply_to_bot", "mentions_bot")
+
+    def __init__(self, is_valid, reply_to_bot, mentions_bot):
+        self.is_valid = is_valid
+        self.reply_to_bot = reply_to_bot
+        self.mentions_bot = mentions_bot
+
+def _replies_to_bot(message, bot_user_id):
+    # With only message_reference we can't tell who it replies to, reply_author_id is None then
+    return message.reply_author_id is not None and message.reply_author_id == bot_user_id
+
+def _mention_decision(message, content_mention_ids, bot_user_id):
+    # Only a single mention of the bot itself is allowed, content mentions take precedence
+    mention_ids = content_mention_ids or message.mention_ids
+    if mention_ids:
+        return len(mention_ids) == 1 and mention_ids[0] == bot_user_id
+    return True
+
+def classify_message(message, bot_user_id):
+    """
+    Decides in one pass over the content whether a message is worth replying to:
+    - Ignores the bot's own messages
+    - Processes standalone messages with no mentions
+    - Processes replies to the bot's messages (for conversations)
+    - Ignores replies to other users' messages
+    - Ignores messages with mentions (except when replying to the bot)
+    - Ignores attachments, links, custom emoji and messages that are mostly emoji
+    Messages that are skipped anyway are returned without scanning the content.
+    """
+    mentions_bot = bot_user_id in message.mention_ids
+
+    # Skip bot's own messages
+    if message.author_id == bot_user_id:
+        return MessageClass(False, False, mentions_bot)
+
+    reply_to_bot = _replies_to_bot(message, bot_user_id)
+    if message.is_reply and not reply_to_bot:
+        return MessageClass(False, False, mentions_bot)
+
+    valid_text, mention_ids = scan_content(message.content)
+    should_process = reply_to_bot or _mention_decision(message, mention_ids, bot_user_id)
+    is_valid = should_process and not message.has_attachments and valid_text
+    return MessageClass(is_valid, reply_to_bot, mentions_bot)
@@ -0,0 +1,139 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict, deque
+
+class Exchange:
+    __slots__ = ("user", "bot", "timestamp")
+
+    def __init__(self, user, bot, timestamp):
+        self.user = user
+        self.bot = bot
+        self.timestamp = timestamp
+
+class _Conversation:
+    __slots__ = ("exchanges", "last_update", "lock")
+
+    def __init__(self, max_length, last_update):
+        self.exchanges = deque(maxlen=max_length)
+        self.last_update = last_update
+        self.lock = threading.Lock()
+
+class ConversationStore:
+    """
+    Conversation history per (user_id, channel_id).
+
+    Conversations are kept in an OrderedDict ordered by last update, so the
+    oldest ones are always at the front and cleanup only touches the entries
+    that actually expired. The index lock is held only for lookups and
+    reordering, exchanges are appended under each conversation's own lock.
+
+    With a persistent backend, `loader(user_id, channel_id)` returns stored
+    (user_message, bot_response, timestamp) rows the first time a conversation
+    is touched, and `on_add` receives every new exchange. Loaded conversations
+    arrive in no particular order, they wait in a separate index with a heap
+    by last update until a new exchange moves them into the ordered one. Keys
+    the loader had nothing for are remembered in a bounded set, so they aren't
+    read again on every lookup.
+    """
+
+    def __init__(self, max_length=7, expiry=3600, loader=None, on_add=None, max_missing=4096):
+        self.max_length = max_length
+        self.expiry = expiry
+        self.max_missing = max_missing
+        self.loader = loader
+        self.on_add = on_add
+        self._conversations = OrderedDict()
+        self._stored = {}  # Loaded from the backend and not updated since
+        self._stored_expiry = []  # Heap of (last_update, key) for _stored
+        self._missing = OrderedDict()  # Keys without stored rows, oldest first
+        self._index_lock = threading.Lock()
+
+    def _ensure_loaded(self, key):
+        if self.loader is None:
+            return
+        with self._index_lock:
+            if key in self._missing or key in self._conversations or key in self._stored:
+                return
+        # Disk read happens outside the index lock
+        rows = self.loader(*key)
+        with self._index_lock:
+            if key in self._conversations or key in self._stored:
+                return
+            if not rows:
+                self._missing[key] = None
+                if len(self._missing) > self.max_missing:
+                    self._missing.popitem(last=False)
+                return
+            conversation = _Conversation(self.max_length, rows[-1][2])
+            for user_message, bot_response, timestamp in rows:
+                conversation.exchanges.append(Exchange(user_message, bot_response, timestamp))
+            self._stored[key] = conversation
+            heapq.heappush(self._stored_expiry, (conversation.last_update, key))
+
+    def _remove(self, key):
+        # Caller must hold the index lock
+        if self._conversations.pop(key, None) is None:
+            self._stored.pop(key, None)
+
+    def __len__(self):
+        with self._index_lock:
+            return len(self._conversations) + len(self._stored)
+
+    def add_exchange(self, user_id, channel_id, user_message, bot_response, timestamp=None):
+        """Appends one exchange and returns how many the conversation now holds."""
+        key = (user_id, channel_id)
+        timestamp = time.time() if timestamp is None else timestamp
+        self._ensure_loaded(key)
+        with self._index_lock:
+            conversation = self._conversations.get(key)
+            if conversation is None:
+                # A loaded conversation joins the ordered index on its first new exchange
+                conversation = self._stored.pop(key, None) or _Conversation(self.max_length, timestamp)
+                self._conversations[key] = conversation
+                self._missing.pop(key, None)
+            conversation.last_update = max(conversation.last_update, timestamp)
+            self._conversations.move_to_end(key)
+        with conversation.lock:
+            conversation.exchanges.append(Exchange(user_message, bot_response, timestamp))
+            total_exchanges = len(conversation.exchanges)
+        if self.on_add is not None:
+            self.on_add(user_id, channel_id, user_message, bot_response, timestamp)
+        return total_exchanges
+
+    def get_history(self, user_id, channel_id):
+        """
+        Returns a snapshot list of exchanges, oldest first. Returns None when the
+        conversation had expired and was removed by this call.
+        """
+        key = (user_id, channel_id)
+        self._ensure_loaded(key)
+        with self._index_lock:
+            conversation = self._conversations.get(key) or self._stored.get(key)
+            if conversation is None:
+                return []
+            if time.time() - conversation.last_update > self.expiry:
+                self._remove(key)
+                return None
+        with conversation.lock:
+            return list(conversation.exchanges)
+
+    def cleanup_expired(self):
+        """Removes expired conversations from the old end of both indexes, returns how many."""
+        cutoff = time.time() - self.expiry
+        removed = 0
+        with self._index_lock:
+            while self._conversations:
+                key, conversation = next(iter(self._conversations.items()))
+                if conversation.last_update >= cutoff:
+                    break
+                del self._conversations[key]
+                removed += 1
+            while self._stored_expiry and self._stored_expiry[0][0] < cutoff:
+                _, key = heapq.heappop(self._stored_expiry)
+                # Entries of conversations updated or removed since they were loaded are stale
+                conversation = self._stored.get(key)
+                if conversation is not None and conversation.last_update < cutoff:
+                    del self._stored[key]
+                    removed += 1
+        return removed
@@ -0,0 +1,148 @@
+import bisect
+import mmap
+import os
+import random
+import threading
+from array import array
+from collections import deque
+from itertools import accumulate
+
+class _Index:
+    __slots__ = ("signature", "data", "fd", "starts", "ends", "cumulative")
+
+    def __init__(self, signature, data, fd, starts, ends, cumulative):
+        self.signature = signature
+        self.data = data  # File bytes for small files, None when lines are read with pread
+        self.fd = fd
+        self.starts = starts
+        self.ends = ends
+        self.cumulative = cumulative  # Running weight totals, None when unweighted
+
+    def __len__(self):
+        return len(self.starts)
+
+    def line(self, position):
+        start, end = self.starts[position], self.ends[position]
+        if self.data is not None:
+            raw = self.data[start:end]
+        else:
+            raw = os.pread(self.fd, end - start, start)
+        return raw.decode("utf-8", errors="replace").strip()
+
+    def __del__(self):
+        # Closed only once no pick can still be reading through this index
+        if self.fd is not None:
+            os.close(self.fd)
+
+def parse_weight(line):
+    # "3|some text" weighs 3, anything else weighs 1
+    prefix, separator, _ = line.partition(b"|")
+    if separator and prefix.strip().isdigit():
+        return int(prefix), len(prefix) + 1
+    return 1, 0
+
+class MessageCorpus:
+    """
+    Random lines from a text file without re-reading it for every pick.
+
+    The file is indexed once into (start, end) byte offsets of its non-blank
+    lines and re-indexed only when its mtime or size changes. Files above
+    `mmap_threshold` bytes are scanned through mmap and lines are read with
+    pread, so the file itself is never held in memory.
+
+    `no_repeat` skips the last N picked lines, `weighted` honours a leading
+    "N|" weight on each line. Both can be changed at any time without a reload.
+    """
+
+    def __init__(self, path, no_repeat=0, weighted=False, mmap_threshold=1024 * 1024, rng=None):
+        self.path = path
+        self.no_repeat = no_repeat
+        self.weighted = weighted
+        self.mmap_threshold = mmap_threshold
+        self.rng = rng or random.Random()
+        self._index = None
+        self._recent = deque()
+        self._recent_set = set()
+        self._lock = threading.Lock()
+
+    def _scan(self, view):
+        starts = array("Q")
+        ends = array("Q")
+        weights = array("Q")
+        position = 0
+        length = len(view)
+        while position < length:
+            end = view.find(b"\n", position)
+            if end == -1:
+                end = length
+            line = view[position:end]
+            weight, skip = parse_weight(line) if self.weighted else (1, 0)
+            if weight > 0 and line[skip:].strip():
+                starts.append(position + skip)
+                ends.append(end)
+                weights.append(weight)
+            position = end + 1
+        return starts, ends, weights
+
+    def _build(self, signature):
+        fd = None
+        data = None
+        if signature[1] >= self.mmap_threshold:
+            fd = os.open(self.path, os.O_RDONLY)
+            try:
+                with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as view:
+                    starts, ends, weights = self._scan(view)
+            except BaseException:
+                os.close(fd)
+                raise
+        else:
+            with open(self.path, "rb") as file:
+                data = file.read()
+            starts, ends, weights = self._scan(data)
+        cumulative = array("Q", accumulate(weights)) if self.weighted else None
+        return _Index(signature + (self.weighted,), data, fd, starts, ends, cumulative)
+
+    def _current(self):
+        stat = os.stat(self.path)  # FileNotFoundError goes to the caller
+        signature = (stat.st_mtime_ns, stat.st_size)
+        index = self._index
+        if index is not None and index.signature == signature + (self.weighted,):
+            return index
+        with self._lock:
+            index = self._index
+            if index is None or index.signature != signature + (self.weighted,):
+                index = self._index = self._build(signature)
+                self._recent.clear()
+                self._recent_set.clear()
+            return index
+
+    def __len__(self):
+        return len(self._current())
+
+    def _draw(self, index):
+        if index.cumulative is not None:
+            return bisect.bisect_right(index.cumulative, self.rng.randrange(index.cumulative[-1]))
+        return self.rng.randrange(len(index))
+
+    def pick(self):
+        """A random line, or None when the file has no non-blank lines. Raises FileNotFoundError."""
+        index = self._current()
+        count = len(index)
+        if not count:
+            return None
+        window = min(self.no_repeat, count - 1)
+        with self._lock:
+            position = self._draw(index)
+            if window > 0:
+                attempts = 8
+                while position in self._recent_set and attempts:
+                    position = self._draw(index)
+                    attempts -= 1
+                if position in self._recent_set:
+                    # Window covers nearly the whole file, fall back to choosing among what is left
+                    position = self.rng.choice([item for item in range(count) if item not in self._recent_set])
+                self._recent.append(position)
+                self._recent_set.add(position)
+                while len(self._recent) > window:
+                    self._recent_set.discard(self._recent.popleft())
+        return index.line(position)
@@ -0,0 +1,42 @@
+import time
+
+class Deadline:
+    """
+    Time budget for one unit of work (a channel iteration or one of its stages).
+
+    split() hands a share of the budget to a stage, capped by what is left of
+    the parent. timeout() turns the remaining time into a (connect, read)
+    timeout for requests. The floor `min_timeout` still gives a late call a
+    short chance instead of failing without trying.
+    """
+
+    def __init__(self, budget, connect_timeout=5.0, min_timeout=1.0):
+        self.budget = budget
+        self.connect_timeout = connect_timeout
+        self.min_timeout = min_timeout
+        self.started = time.monotonic()
+        self.paused = 0.0
+
+    def elapsed(self):
+        return time.monotonic() - self.started - self.paused
+
+    def remaining(self):
+        return max(0.0, self.budget - self.elapsed())
+
+    def expired(self):
+        return self.elapsed() >= self.budget
+
+    def overrun(self):
+        """Seconds spent beyond the budget, 0 when still within it."""
+        return max(0.0, self.elapsed() - self.budget)
+
+    def pause(self, seconds):
+        # Deliberate waits (slow mode) do not count against the budget
+        self.paused += seconds
+
+    def split(self, share):
+        return Deadline(min(self.budget * share, self.remaining()), self.connect_timeout, self.min_timeout)
+
+    def timeout(self):
+        read = max(self.min_timeout, self.remaining())
+        return min(self.connect_timeout, read), read
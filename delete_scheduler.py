@@ -0,0 +1,79 @@
+import heapq
+import threading
+import time
+
+class DeleteScheduler:
+    """
+    Runs delayed message deletes from a single worker thread.
+
+    Pending deletes live in a min-heap of (due_time, channel_id, message_id, token)
+    so the worker only ever sleeps until the earliest one is due. Deletes that
+    come due within `batch_window` seconds of each other are drained together
+    in one wakeup.
+    """
+
+    def __init__(self, delete_func, batch_window=0.1, log_func=None):
+        self.delete_func = delete_func
+        self.log_func = log_func
+        self.batch_window = batch_window
+        self._heap = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def schedule(self, channel_id, message_id, token, delay=0):
+        due_time = time.monotonic() + max(delay, 0)
+        with self._condition:
+            heapq.heappush(self._heap, (due_time, channel_id, message_id, token))
+            if self._thread is None:
+                self._start()
+            # Wake the worker in case this delete is due before the current head
+            self._condition.notify()
+
+    def queue_depth(self):
+        with self._condition:
+            return len(self._heap)
+
+    def stop(self, timeout=5):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _start(self):
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="delete-scheduler", daemon=True)
+        self._thread.start()
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._stopped:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                wait_time = self._heap[0][0] - time.monotonic()
+                if wait_time > 0:
+                    self._condition.wait(wait_time)
+                    continue
+                # Drain everything that is due now or within the batch window
+                cutoff = time.monotonic() + self.batch_window
+                batch = []
+                while self._heap and self._heap[0][0] <= cutoff:
+                    batch.append(heapq.heappop(self._heap))
+                return batch
+            return []
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            for _, channel_id, message_id, token in batch:
+                try:
+                    self.delete_func(channel_id, message_id, token)
+                except Exception as e:
+                    # A failing delete must never kill the worker
+                    if self.log_func:
+                        self.log_func(f"[Channel {channel_id}] Kesalahan saat menghapus pesan {message_id}: {e}", "ERROR")
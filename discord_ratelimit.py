@@ -0,0 +1,159 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+MAJOR_PARAMETERS = ("channels", "guilds", "webhooks")
+
+def route_key(method, url):
+    """
+    Discord rate limits by route: the method and the path with IDs replaced,
+    except the major parameter (channel / guild / webhook ID). Returns
+    (route, major) where major is e.g. "channels/123".
+    """
+    route = []
+    major = ""
+    previous = None
+    for segment in urlsplit(url).path.strip("/").split("/"):
+        if segment.isdigit():
+            if previous in MAJOR_PARAMETERS and not major:
+                major = f"{previous}/{segment}"
+            else:
+                segment = ":id"
+        route.append(segment)
+        previous = segment
+    return f"{method.upper()} /{'/'.join(route)}", major
+
+def _header_float(headers, name):
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class _Bucket:
+    __slots__ = ("name", "limit", "remaining", "reset_at")
+
+    def __init__(self, name):
+        self.name = name
+        self.limit = None
+        self.remaining = None  # None until Discord has told us, requests pass freely until then
+        self.reset_at = 0.0
+
+class DiscordRateLimiter:
+    """
+    Client-side view of Discord's per-route rate limit buckets, per token.
+
+    Routes are mapped to buckets with X-RateLimit-Bucket (several routes can
+    share one bucket), the bucket state comes from X-RateLimit-Limit,
+    -Remaining and -Reset-After. reserve() takes one request slot or returns
+    how long to wait for one, so the same limiter serves blocking threads and
+    the asyncio engine.
+    """
+
+    def __init__(self, max_retry_wait=30.0):
+        self.max_retry_wait = max_retry_wait  # Longer 429 waits are returned to the caller instead of retried
+        self.waits = 0
+        self.retries = 0
+        self._bucket_ids = {}  # (token, route) -> X-RateLimit-Bucket
+        self._buckets = {}  # (token, bucket id or route, major route) -> _Bucket
+        self._global_reset = {}  # token -> monotonic time a global limit ends
+        self._lock = threading.Lock()
+
+    def _bucket(self, token, route, major):
+        # Caller must hold the lock
+        bucket_id = self._bucket_ids.get((token, route))
+        # A shared bucket hash still counts separately per major parameter
+        key = (token, bucket_id or route, major)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(f"{bucket_id} {major}".strip() if bucket_id else route)
+        return bucket
+
+    def reserve(self, token, method, url):
+        """Takes a slot and returns 0, or returns the seconds to wait before calling again."""
+        route, major = route_key(method, url)
+        now = time.monotonic()
+        with self._lock:
+            wait = self._global_reset.get(token, 0.0) - now
+            if wait > 0:
+                self.waits += 1
+                return wait
+            bucket = self._bucket(token, route, major)
+            if bucket.remaining is None:
+                return 0.0
+            if bucket.reset_at <= now:
+                if bucket.limit is None:
+                    # Only ever seen a bare 429, nothing to count against until Discord says more
+                    bucket.remaining = None
+                    return 0.0
+                bucket.remaining = bucket.limit
+                bucket.reset_at = now + 1.0  # Unknown until the next response, assume a short window
+            if bucket.remaining > 0:
+                bucket.remaining -= 1
+                return 0.0
+            self.waits += 1
+            return max(0.01, bucket.reset_at - now)
+
+    def wait(self, token, method, url, max_wait=None):
+        """
+        Blocking reserve() for the threaded loops. Returns the seconds waited,
+        or None without sleeping when the slot is further away than max_wait.
+        """
+        waited = 0.0
+        while True:
+            delay = self.reserve(token, method, url)
+            if delay <= 0:
+                return waited
+            if max_wait is not None and waited + delay > max_wait:
+                return None
+            time.sleep(delay)
+            waited += delay
+
+    def update(self, token, method, url, status, headers, body=None):
+        """
+        Records one response's rate limit headers. Returns the seconds to wait
+        before retrying a 429, or None when it should not be retried.
+        """
+        route, major = route_key(method, url)
+        now = time.monotonic()
+        with self._lock:
+            bucket_id = headers.get("X-RateLimit-Bucket")
+            if bucket_id:
+                self._bucket_ids[(token, route)] = bucket_id
+            bucket = self._bucket(token, route, major)
+            limit = _header_float(headers, "X-RateLimit-Limit")
+            remaining = _header_float(headers, "X-RateLimit-Remaining")
+            reset_after = _header_float(headers, "X-RateLimit-Reset-After")
+            if limit is not None:
+                bucket.limit = int(limit)
+            if remaining is not None:
+                bucket.remaining = int(remaining)
+            if reset_after is not None:
+                bucket.reset_at = now + reset_after
+
+            if status != 429:
+                return None
+            retry_after = body.get("retry_after") if isinstance(body, dict) else None
+            if retry_after is None:
+                retry_after = _header_float(headers, "Retry-After") or reset_after or 1.0
+            retry_after = float(retry_after)
+            is_global = (isinstance(body, dict) and body.get("global")) or headers.get("X-RateLimit-Global") == "true"
+            if is_global:
+                self._global_reset[token] = now + retry_after
+            else:
+                bucket.remaining = 0
+                bucket.reset_at = max(bucket.reset_at, now + retry_after)
+            if retry_after > self.max_retry_wait:
+                return None
+            self.retries += 1
+            return retry_after
+
+    def snapshot(self):
+        """[(token, bucket, limit, remaining, seconds until reset)] for buckets Discord has reported on."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (token, bucket.name, bucket.limit, bucket.remaining, max(0.0, bucket.reset_at - now))
+                for (token, _, _), bucket in self._buckets.items()
+                if bucket.remaining is not None
+            ]
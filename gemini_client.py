@@ -0,0 +1,199 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from http_client import gemini_session, gemini_url
+
+def parse_retry_after(headers, body=None):
+    """Seconds to wait from a Retry-After header or a google.rpc.RetryInfo body, or None."""
+    value = headers.get('Retry-After') if headers else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    error = body.get('error') if isinstance(body, dict) else None
+    if isinstance(error, dict):
+        for detail in error.get('details') or []:
+            delay = detail.get('retryDelay') if isinstance(detail, dict) else None
+            if isinstance(delay, str) and delay.endswith('s'):
+                try:
+                    return max(0.0, float(delay[:-1]))
+                except ValueError:
+                    pass
+    return None
+
+def gemini_payload(text):
+    return {'contents': [{'parts': [{'text': text}]}]}
+
+def extract_generated_text(result):
+    return result['candidates'][0]['content']['parts'][0]['text']
+
+def json_or_none(response):
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=30.0):
+    # Full jitter: random point between 0 and the exponential ceiling
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+class _KeyState:
+    __slots__ = ("open_until", "failures", "rate_limits")
+
+    def __init__(self):
+        self.open_until = 0.0
+        self.failures = 0
+        self.rate_limits = 0
+
+class GeminiKeyPool:
+    """
+    Per-key circuit breakers for the Gemini API keys.
+
+    A key that returns 429 is opened for its Retry-After (or an exponential
+    cooldown when the server gives none). Repeated errors open it too. Once
+    the cooldown passes the key is tried again and the first success closes it.
+    acquire() returns None when every key is open, callers fail fast instead
+    of waiting.
+    """
+
+    def __init__(self, api_keys, failure_threshold=3, base_cooldown=60, max_cooldown=3600):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self._keys = {key: _KeyState() for key in api_keys}
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        now = time.monotonic()
+        with self._lock:
+            available = [key for key, state in self._keys.items() if state.open_until <= now]
+        return random.choice(available) if available else None
+
+    def next_available_in(self):
+        now = time.monotonic()
+        with self._lock:
+            if not self._keys:
+                return None
+            return max(0.0, min(state.open_until for state in self._keys.values()) - now)
+
+    def record_success(self, key):
+        with self._lock:
+            state = self._keys[key]
+            state.open_until = 0.0
+            state.failures = 0
+            state.rate_limits = 0
+
+    def record_rate_limit(self, key, retry_after=None):
+        with self._lock:
+            state = self._keys[key]
+            state.rate_limits += 1
+            if retry_after is None:
+                retry_after = min(self.max_cooldown, self.base_cooldown * (2 ** (state.rate_limits - 1)))
+            state.open_until = time.monotonic() + retry_after
+            return retry_after
+
+    def record_failure(self, key):
+        with self._lock:
+            state = self._keys[key]
+            state.failures += 1
+            if state.failures >= self.failure_threshold:
+                state.open_until = time.monotonic() + self.base_cooldown
+                return True
+            return False
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            open_keys = sum(1 for state in self._keys.values() if state.open_until > now)
+            return {"keys": len(self._keys), "open": open_keys, "closed": len(self._keys) - open_keys}
+
+class GeminiClient:
+    """Bounded, non-blocking Gemini calls on top of a GeminiKeyPool."""
+
+    def __init__(self, key_pool, max_attempts=4, base_delay=1.0, max_delay=30.0, log_func=None):
+        self.key_pool = key_pool
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.log_func = log_func
+
+    def log(self, message, level="INFO"):
+        if self.log_func:
+            self.log_func(message, level)
+
+    def key_label(self, key):
+        return f"{key[:6]}..." if len(key) > 6 else key
+
+    def generate(self, prompt_text, deadline=None):
+        """
+        Returns the generated text, or None once the attempts, the available keys
+        or the deadline (a deadline.Deadline) run out.
+        """
+        payload = gemini_payload(prompt_text)
+        for attempt in range(self.max_attempts):
+            if self.out_of_time(deadline):
+                return None
+            api_key = self.acquire_key()
+            if api_key is None:
+                return None
+            try:
+                response = gemini_session().post(gemini_url(api_key), json=payload, timeout=deadline.timeout() if deadline else None)
+                text, backoff = self.handle_response(api_key, response.status_code, response.headers, json_or_none(response))
+            except requests.exceptions.RequestException as e:
+                text, backoff = None, self.on_failure(api_key, f"Request failed: {e}")
+            if text is not None:
+                return text
+            if backoff and attempt + 1 < self.max_attempts:
+                time.sleep(self.backoff(attempt, deadline))
+        self.log(f"Gemini gagal setelah {self.max_attempts} percobaan. Balasan dilewati.", "ERROR")
+        return None
+
+    def out_of_time(self, deadline):
+        if deadline is not None and deadline.expired():
+            self.log(f"Anggaran waktu Gemini ({deadline.budget:.1f} detik) habis. Balasan dilewati.", "WARNING")
+            return True
+        return False
+
+    def acquire_key(self):
+        api_key = self.key_pool.acquire()
+        if api_key is None:
+            wait = self.key_pool.next_available_in() or 0
+            self.log(f"Semua API key sedang cooldown ({wait:.0f} detik lagi). Balasan dilewati.", "ERROR")
+        return api_key
+
+    def backoff(self, attempt, deadline=None):
+        delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+        # Never sleep past the deadline, the next attempt would be skipped anyway
+        return min(delay, deadline.remaining()) if deadline is not None else delay
+
+    def handle_response(self, api_key, status, headers, body):
+        """
+        Updates the key's breaker from one response. Returns (text, backoff):
+        text is None when the call failed, backoff says whether to sleep before retrying.
+        """
+        if status == 429:
+            retry_after = self.key_pool.record_rate_limit(api_key, parse_retry_after(headers, body))
+            self.log(f"API key {self.key_label(api_key)} terkena rate limit (429). Cooldown {retry_after:.0f} detik, menggunakan API key lain...", "WARNING")
+            # Another key can be tried right away
+            return None, False
+        if status >= 400 or body is None:
+            return None, self.on_failure(api_key, f"Gemini error. Status: {status}")
+        try:
+            text = extract_generated_text(body)
+        except (KeyError, IndexError, TypeError):
+            return None, self.on_failure(api_key, "Respons Gemini tidak berisi teks")
+        self.key_pool.record_success(api_key)
+        return text, False
+
+    def on_failure(self, api_key, message):
+        opened = self.key_pool.record_failure(api_key)
+        self.log(message + (" (API key dinonaktifkan sementara)" if opened else ""), "ERROR")
+        return True
@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+from discord_ratelimit import DiscordRateLimiter
+
+# Overridable so the bot can be pointed at local stand-ins (see benchmarks/standins.py)
+DISCORD_API_BASE = os.getenv('DISCORD_API_BASE', "https://discord.com/api/v9").rstrip("/")
+GEMINI_API_BASE = os.getenv('GEMINI_API_BASE', "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+GEMINI_MODEL = "gemini-1.5-flash-latest"
+
+# Number of keep-alive connections kept open per session
+pool_size = int(os.getenv('HTTP_POOL_SIZE', '10'))
+
+# Used by every call that does not pass its own timeout, so nothing can hang forever
+connect_timeout = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+read_timeout = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+
+# Discord rate limit buckets, shared by every token's session and the asyncio engine
+discord_limiter = DiscordRateLimiter()
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_response_hooks = []
+
+def add_response_hook(func):
+    """Registers func(api, response), called for every response on every pooled session."""
+    _response_hooks.append(func)
+
+def _response_hook(api):
+    def hook(response, *args, **kwargs):
+        for func in _response_hooks:
+            func(api, response)
+    return hook
+
+class TimeoutSession(requests.Session):
+    def request(self, method, url, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = (connect_timeout, read_timeout)
+        return super().request(method, url, timeout=timeout, **kwargs)
+
+class DiscordSession(TimeoutSession):
+    """
+    Waits for the route's rate limit bucket before every call and retries one
+    429 after its retry_after. The read timeout bounds the whole call, waits
+    included: a slot or retry further away than that is not waited for.
+    """
+
+    def __init__(self, token):
+        super().__init__()
+        self.token = token
+
+    def _send_once(self, method, url, connect, ends_at, **kwargs):
+        remaining = ends_at - time.monotonic()
+        if discord_limiter.wait(self.token, method, url, max_wait=remaining) is None:
+            raise requests.exceptions.Timeout(f"Rate limit Discord untuk {method} {url} lebih lama dari timeout {remaining:.1f} detik")
+        # The read timeout is the budget of the whole call, rate limit waits included
+        remaining = max(ends_at - time.monotonic(), 0.1)
+        response = super().request(method, url, timeout=(min(connect, remaining), remaining), **kwargs)
+        body = None
+        if response.status_code == 429:
+            try:
+                body = response.json()
+            except ValueError:
+                pass
+        return response, discord_limiter.update(self.token, method, url, response.status_code, response.headers, body)
+
+    def request(self, method, url, timeout=None, **kwargs):
+        connect, read = timeout if isinstance(timeout, tuple) else (connect_timeout, timeout or read_timeout)
+        ends_at = time.monotonic() + read
+        response, retry_after = self._send_once(method, url, connect, ends_at, **kwargs)
+        # A retry that can't finish within the caller's timeout is left to the caller
+        if retry_after is not None and retry_after < ends_at - time.monotonic():
+            time.sleep(retry_after)
+            response, _ = self._send_once(method, url, connect, ends_at, **kwargs)
+        return response
+
+def _create_session(api, headers, session_factory):
+    session = session_factory()
+    session.hooks["response"].append(_response_hook(api))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(headers)
+    return session
+
+def _get_session(key, headers, session_factory=TimeoutSession):
+    # Fast path without the lock, sessions are never replaced once created
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _create_session(key[0], headers, session_factory)
+            _sessions[key] = session
+        return session
+
+def discord_session(token):
+    """Pooled session for one Discord token, Authorization header is set once."""
+    return _get_session(("discord", token), {'Authorization': token, 'Accept': 'application/json'}, lambda: DiscordSession(token))
+
+def gemini_session(model=GEMINI_MODEL):
+    """Pooled session for one Gemini model endpoint, shared by all API keys."""
+    return _get_session(("gemini", model), {'Content-Type': 'application/json'})
+
+def discord_url(path):
+    return f"{DISCORD_API_BASE}{path}"
+
+def gemini_url(api_key, model=GEMINI_MODEL):
+    return f"{GEMINI_API_BASE}/models/{model}:generateContent?key={api_key}"
+
+def close_all_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,84 @@
+from collections import deque
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a set of phrases.
+
+    The automaton is built once, after that find_all() reports every phrase
+    occurrence (overlapping ones included) in a single pass over the text,
+    no matter how many phrases were added. Matching is case-insensitive.
+    """
+
+    def __init__(self, phrases=None, tag=None):
+        self._phrases = []
+        self._built = False
+        if phrases:
+            self.add_all(phrases, tag)
+
+    def add(self, phrase, tag=None):
+        phrase = phrase.lower()
+        if phrase:
+            self._phrases.append((phrase, tag))
+            self._built = False
+
+    def add_all(self, phrases, tag=None):
+        for phrase in phrases:
+            self.add(phrase, tag)
+
+    def __len__(self):
+        return len(self._phrases)
+
+    def _build(self):
+        goto = [{}]
+        outputs = [[]]
+        for phrase, tag in self._phrases:
+            state = 0
+            for char in phrase:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append((phrase, tag))
+
+        # Breadth-first pass to set failure links and inherit outputs of suffixes
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = [tuple(output) for output in outputs]
+        self._built = True
+
+    def find_all(self, text, lowered=False):
+        """Returns [(start, phrase, tag), ...] for every occurrence in text."""
+        if not self._built:
+            self._build()
+        if not lowered:
+            text = text.lower()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        hits = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                for phrase, tag in outputs[state]:
+                    hits.append((index - len(phrase) + 1, phrase, tag))
+        return hits
+
+    def tags(self, text, lowered=False):
+        """Set of tags whose phrases occur anywhere in text."""
+        return {tag for _, _, tag in self.find_all(text, lowered)}
@@ -0,0 +1,162 @@
+import json
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from colorama import Fore, Style
+
+LEVELS = {"DEBUG": 10, "WAIT": 15, "INFO": 20, "SUCCESS": 25, "WARNING": 30, "ERROR": 40}
+
+LEVEL_STYLES = {
+    "SUCCESS": (Fore.GREEN, "✅"),
+    "ERROR": (Fore.RED, "🚨"),
+    "WARNING": (Fore.YELLOW, "⚠️"),
+    "WAIT": (Fore.CYAN, "⌛"),
+}
+
+_FLUSH = object()
+_STOP = object()
+
+class LogRecord:
+    __slots__ = ("created", "level", "message", "repeats")
+
+    def __init__(self, created, level, message):
+        self.created = created
+        self.level = level
+        self.message = message
+        self.repeats = 0
+
+class ConsoleFormatter:
+    """The bot's original colored output, optionally without the 80-character borders."""
+
+    def __init__(self, border=True):
+        self.border = f"{Fore.MAGENTA}{'=' * 80}{Style.RESET_ALL}" if border else None
+
+    def format(self, record):
+        color, icon = LEVEL_STYLES.get(record.level, (Fore.WHITE, "ℹ️"))
+        timestamp = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S')
+        repeats = f" (diulang {record.repeats}x)" if record.repeats else ""
+        line = f"{color}[{timestamp}] {icon} {record.message}{repeats}{Style.RESET_ALL}"
+        if self.border:
+            return f"{self.border}\n{line}\n{self.border}"
+        return line
+
+class JsonFormatter:
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.level,
+            "message": record.message,
+        }
+        if record.repeats:
+            entry["repeats"] = record.repeats
+        return json.dumps(entry, ensure_ascii=False)
+
+class QueueLogger:
+    """
+    Non-blocking logger: log() only filters and enqueues, one background
+    thread formats and writes batches to every sink.
+
+    Identical messages below WARNING are written at most once per
+    `repeat_window` seconds. The next one written after the window carries
+    the number of copies that were suppressed in between.
+
+    Records that don't fit in a full queue are dropped and counted in
+    `dropped`, the writer reports how many with the next batch it writes.
+    """
+
+    def __init__(self, min_level="WAIT", sinks=None, repeat_window=60, max_queue=10000):
+        self.min_level = LEVELS.get(min_level.upper(), LEVELS["WAIT"])
+        self.sinks = sinks if sinks is not None else [(sys.stdout, ConsoleFormatter())]
+        self.repeat_window = repeat_window
+        self.dropped = 0
+        self._dropped_reported = 0  # Writer thread only
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._recent = OrderedDict()  # message -> [last_written, suppressed], writer thread only
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, message, level="INFO"):
+        level = level.upper()
+        if LEVELS.get(level, LEVELS["INFO"]) < self.min_level:
+            return
+        try:
+            self._queue.put_nowait(LogRecord(time.time(), level, message))
+        except queue.Full:
+            # Never block a channel loop on logging
+            self.dropped += 1
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def flush(self, timeout=5):
+        """Blocks until everything logged so far has been written (used before input prompts)."""
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait(timeout)
+
+    def close(self, timeout=5):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _should_write(self, record):
+        if not self.repeat_window or LEVELS.get(record.level, 0) >= LEVELS["WARNING"]:
+            return True
+        entry = self._recent.get(record.message)
+        if entry is not None and record.created - entry[0] < self.repeat_window:
+            entry[1] += 1
+            return False
+        record.repeats = entry[1] if entry else 0
+        self._recent[record.message] = [record.created, 0]
+        self._recent.move_to_end(record.message)
+        # Forget messages that have not been seen for a whole window
+        while self._recent:
+            oldest = next(iter(self._recent.values()))
+            if record.created - oldest[0] < self.repeat_window:
+                break
+            self._recent.popitem(last=False)
+        return True
+
+    def _drop_notice(self, records):
+        dropped = self.dropped
+        if dropped > self._dropped_reported:
+            records.append(LogRecord(time.time(), "WARNING", f"{dropped - self._dropped_reported} pesan log dibuang karena antrean log penuh"))
+            self._dropped_reported = dropped
+        return records
+
+    def _write(self, records):
+        for stream, formatter in self.sinks:
+            try:
+                stream.write("".join(formatter.format(record) + "\n" for record in records))
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            # Write everything that piled up in one go
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = []
+            for item in items:
+                if isinstance(item, LogRecord):
+                    if self._should_write(item):
+                        records.append(item)
+                    continue
+                if self._drop_notice(records):
+                    self._write(records)
+                    records = []
+                if item is _STOP:
+                    return
+                item[1].set()
+            if self._drop_notice(records):
+                self._write(records)
@@ -0,0 +1,88 @@
+import threading
+import time
+
+from single_flight import SingleFlight
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Thread-safe TTL cache for channel and guild metadata.
+
+    get_or_load() coalesces concurrent misses: the first caller runs the loader
+    while everyone else asking for the same key waits for its result. Failed
+    loads are not cached, the error is raised in every waiting caller.
+    """
+
+    def __init__(self, ttl=300, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._loads = SingleFlight()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key, now):
+        # Caller must hold the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return _MISSING
+        return value
+
+    def _store(self, key, value, now):
+        # Caller must hold the lock
+        if key not in self._entries and len(self._entries) >= self.maxsize:
+            # Drop expired entries first, then the one closest to expiry
+            for stale_key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[stale_key]
+            if len(self._entries) >= self.maxsize:
+                del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+        self._entries[key] = (now + self.ttl, value)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value, time.monotonic())
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+        return self._loads.do(key, lambda: self._load(key, loader))
+
+    def _load(self, key, loader):
+        with self._lock:
+            # A load for this key may have finished between the miss and joining the flight
+            value = self._lookup(key, time.monotonic())
+        if value is _MISSING:
+            value = loader()
+            with self._lock:
+                self._store(key, value, time.monotonic())
+        return value
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "shared_loads": self._loads.shared,
+            }
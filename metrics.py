@@ -0,0 +1,188 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = ",".join(f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for name, value in pairs)
+    return "{" + escaped + "}"
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, None, value) for key, value in self._values.items()]
+
+    def snapshot(self):
+        with self._lock:
+            return [{"labels": dict(zip(self.labelnames, key)), "value": value} for key, value in self._values.items()]
+
+class CallbackGauge:
+    """Gauge whose values are read from `collect()` ({label tuple: value}) at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames, collect):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def _values(self):
+        try:
+            return self.collect()
+        except Exception:
+            return {}
+
+    def samples(self):
+        return [(self.name, tuple(str(part) for part in key), None, value) for key, value in self._values().items()]
+
+    def snapshot(self):
+        return [{"labels": dict(zip(self.labelnames, key)), "value": value} for key, value in self._values().items()]
+
+class CallbackCounter(CallbackGauge):
+    """Counter kept by another component (it only ever grows), read at scrape time."""
+    kind = "counter"
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label tuple -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, series in self._series.items():
+                for bound, count in zip(self.buckets, series):
+                    samples.append((f"{self.name}_bucket", key, ("le", repr(float(bound))), count))
+                samples.append((f"{self.name}_bucket", key, ("le", "+Inf"), series[-1]))
+                samples.append((f"{self.name}_sum", key, None, series[-2]))
+                samples.append((f"{self.name}_count", key, None, series[-1]))
+        return samples
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {
+                    "labels": dict(zip(self.labelnames, key)),
+                    "count": series[-1],
+                    "sum": round(series[-2], 6),
+                    "buckets": dict(zip((str(bound) for bound in self.buckets), series[:-2])),
+                }
+                for key, series in self._series.items()
+            ]
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def callback_gauge(self, name, help_text, labelnames, collect):
+        return self._register(CallbackGauge(name, help_text, labelnames, collect))
+
+    def callback_counter(self, name, help_text, labelnames, collect):
+        return self._register(CallbackCounter(name, help_text, labelnames, collect))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render_prometheus(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(metric.labelnames, key, extra)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return {
+            "time": time.time(),
+            "metrics": {metric.name: {"type": metric.kind, "samples": metric.snapshot()} for metric in self._metrics},
+        }
+
+def start_http_server(registry, port, host="127.0.0.1"):
+    """Serves GET /metrics in Prometheus text format from a daemon thread."""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def start_snapshot_writer(registry, path, interval=60):
+    """Rewrites `path` with a JSON snapshot every `interval` seconds."""
+    def write_snapshots():
+        while True:
+            time.sleep(interval)
+            temp_path = f"{path}.tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as file:
+                    json.dump(registry.snapshot(), file)
+                os.replace(temp_path, path)
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=write_snapshots, name="metrics-snapshot", daemon=True)
+    thread.start()
+    return thread
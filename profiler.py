@@ -0,0 +1,279 @@
+"""
+Opt-in in-process profiling for a bot that runs for days.
+
+A background thread samples every thread's stack (sys._current_frames) and
+tracemalloc records allocation sites. Every `interval` seconds the samples are
+written to a new directory under `directory` by a separate writer thread, so
+sampling carries on while tracemalloc snapshots are compared. The oldest
+dumps beyond `keep` are removed:
+
+    profile-20240101-120000-0001/
+        all.pstats              every thread together
+        <thread or task>.pstats one per channel thread / asyncio task
+        summary.txt             time in TARGETS per thread / task, top allocation sites
+
+The .pstats files load with `python -m pstats` or snakeviz. They are built from
+samples, so times are wall clock (sleeping and waiting included) and "calls"
+is the number of samples a function was on the stack. An interval without
+samples only gets summary.txt, pstats can't load an empty stats file.
+"""
+import asyncio
+import marshal
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+
+# Functions whose time is broken down per thread / task in summary.txt
+TARGETS = ("auto_reply", "generate_reply", "send_message")
+
+DUMP_PREFIX = "profile-"
+
+def _safe_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name) or "thread"
+
+def _code_key(code):
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+def _coroutine_stack(task):
+    # A suspended task has no thread stack, follow what each coroutine awaits instead (leaf first)
+    stack = []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(_code_key(frame.f_code))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    stack.reverse()
+    return stack
+
+class _Stats:
+    """Sampled equivalent of cProfile's stats: key -> [samples, self seconds, cumulative seconds, {caller: [...]}]."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def add(self, stack, seconds):
+        # stack is leaf first; recursion only counts once towards cumulative time
+        seen = set()
+        for index, key in enumerate(stack):
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = [0, 0.0, 0.0, {}]
+            own = seconds if index == 0 else 0.0
+            entry[1] += own
+            if key in seen:
+                continue
+            seen.add(key)
+            entry[0] += 1
+            entry[2] += seconds
+            if index + 1 < len(stack):
+                caller = entry[3].setdefault(stack[index + 1], [0, 0.0, 0.0])
+                caller[0] += 1
+                caller[1] += own
+                caller[2] += seconds
+
+    def merge(self, other):
+        for key, (count, own, total, callers) in other.entries.items():
+            entry = self.entries.setdefault(key, [0, 0.0, 0.0, {}])
+            entry[0] += count
+            entry[1] += own
+            entry[2] += total
+            for caller_key, values in callers.items():
+                caller = entry[3].setdefault(caller_key, [0, 0.0, 0.0])
+                for position, value in enumerate(values):
+                    caller[position] += value
+
+    def dump(self, path):
+        # Same layout as cProfile.Profile.dump_stats(): {key: (cc, nc, tt, ct, {caller: (cc, nc, tt, ct)})}
+        stats = {
+            key: (count, count, own, total, {caller: (n, n, tt, ct) for caller, (n, tt, ct) in callers.items()})
+            for key, (count, own, total, callers) in self.entries.items()
+        }
+        with open(path, "wb") as file:
+            marshal.dump(stats, file)
+
+class SamplingProfiler:
+    """
+    Samples every thread `sample_interval` seconds and dumps pstats files plus
+    tracemalloc's top allocation sites every `interval` seconds.
+
+    Samples are attributed to the thread name. For an event loop registered
+    with watch_loop() they go to the running task, and every suspended task
+    is sampled as well, so tasks show their waiting time like threads do.
+    """
+
+    def __init__(self, directory, interval=300, sample_interval=0.01, keep=48, top_allocations=25, trace_frames=1, log_func=print):
+        self.directory = directory
+        self.interval = interval
+        self.sample_interval = sample_interval
+        self.keep = keep
+        self.top_allocations = top_allocations
+        self.trace_frames = trace_frames  # 0 disables tracemalloc
+        self.log_func = log_func
+        self._stats = {}  # thread or task name -> _Stats for the current interval
+        self._targets = {}  # (name, target) -> seconds
+        self._samples = 0
+        self._loops = {}  # thread ident -> event loop
+        self._previous_snapshot = None
+        self._interval_started = time.time()
+        self._sequence = 0  # Dumps started within the same second still get their own directory
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._dumps = queue.Queue()  # Swapped out intervals for the writer thread, None stops it
+        self._writer = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self.trace_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+        self._writer = threading.Thread(target=self._write_dumps, name="profiler-writer", daemon=True)
+        self._writer.start()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops sampling and writes what was collected since the last dump."""
+        if self._thread is None or self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._dumps.put(self._swap())
+        self._dumps.put(None)
+        self._writer.join(timeout=30)
+
+    def watch_loop(self, loop=None):
+        """Called from an event loop's thread, attributes that thread's samples to its running task."""
+        loop = loop or asyncio.get_running_loop()
+        self._loops[threading.get_ident()] = loop
+
+    def _run(self):
+        last = time.monotonic()
+        next_dump = last + self.interval
+        while not self._stop.wait(self.sample_interval):
+            now = time.monotonic()
+            self._sample(now - last)
+            last = now
+            if now >= next_dump:
+                self._dumps.put(self._swap())
+                next_dump = now + self.interval
+
+    def _write_dumps(self):
+        while True:
+            interval = self._dumps.get()
+            if interval is None:
+                return
+            self._write(*interval)
+
+    def _attribution(self, ident, names):
+        name = names.get(ident, str(ident))
+        loop = self._loops.get(ident)
+        if loop is not None:
+            # current_task() only reads the loop's entry in a dict, safe enough from another thread
+            task = asyncio.current_task(loop)
+            if task is not None:
+                return f"{name}.{task.get_name()}"
+        return name
+
+    def _sample(self, seconds):
+        own_idents = (threading.get_ident(), self._writer.ident)
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        with self._lock:
+            self._samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident in own_idents:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_code_key(frame.f_code))
+                    frame = frame.f_back
+                self._record(self._attribution(ident, names), stack, seconds)
+            for ident, loop in self._loops.items():
+                self._sample_tasks(names.get(ident, str(ident)), loop, seconds)
+
+    def _sample_tasks(self, thread_name, loop, seconds):
+        # Caller must hold the lock
+        try:
+            tasks = asyncio.all_tasks(loop)
+        except RuntimeError:  # The task set changed while it was copied, try again next sample
+            return
+        running = asyncio.current_task(loop)
+        for task in tasks:
+            if task is not running:
+                stack = _coroutine_stack(task)
+                if stack:
+                    self._record(f"{thread_name}.{task.get_name()}", stack, seconds)
+
+    def _record(self, name, stack, seconds):
+        # Caller must hold the lock
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = _Stats()
+        stats.add(stack, seconds)
+        for target in {key[2] for key in stack if key[2] in TARGETS}:
+            self._targets[(name, target)] = self._targets.get((name, target), 0.0) + seconds
+
+    def _allocation_report(self):
+        if not tracemalloc.is_tracing():
+            return ["tracemalloc tidak aktif"]
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced memory: {current / 1024 / 1024:.1f} MiB (peak {peak / 1024 / 1024:.1f} MiB)", "", "top allocation sites:"]
+        lines.extend(f"  {stat}" for stat in snapshot.statistics("lineno")[:self.top_allocations])
+        if self._previous_snapshot is not None:
+            lines.extend(["", "growth since the previous dump:"])
+            lines.extend(f"  {stat}" for stat in snapshot.compare_to(self._previous_snapshot, "lineno")[:self.top_allocations])
+        self._previous_snapshot = snapshot
+        return lines
+
+    def _swap(self):
+        # Only the swap holds the lock, writing happens on the writer thread
+        with self._lock:
+            stats, self._stats = self._stats, {}
+            targets, self._targets = self._targets, {}
+            samples, self._samples = self._samples, 0
+            started, self._interval_started = self._interval_started, time.time()
+            self._sequence += 1
+            return stats, targets, samples, started, self._sequence
+
+    def _write(self, stats, targets, samples, started, sequence):
+        name = f"{DUMP_PREFIX}{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}-{sequence:04d}"
+        path = os.path.join(self.directory, name)
+        try:
+            os.makedirs(path, exist_ok=True)
+            if samples:
+                combined = _Stats()
+                for thread_name, thread_stats in stats.items():
+                    thread_stats.dump(os.path.join(path, f"{_safe_name(thread_name)}.pstats"))
+                    combined.merge(thread_stats)
+                combined.dump(os.path.join(path, "all.pstats"))
+
+            lines = [f"interval: {time.ctime(started)} - {time.ctime()}, {samples} samples every {self.sample_interval}s", "",
+                     "seconds on the stack per thread / task:"]
+            for (thread_name, target), seconds in sorted(targets.items(), key=lambda item: -item[1]):
+                lines.append(f"  {thread_name:<40} {target:<16} {seconds:10.1f}")
+            lines.append("")
+            lines.extend(self._allocation_report())
+            with open(os.path.join(path, "summary.txt"), "w", encoding="utf-8") as file:
+                file.write("\n".join(lines) + "\n")
+            self._rotate()
+        except OSError as e:
+            self.log_func(f"Gagal menulis profil ke {path}: {e}", "ERROR")
+            return None
+        self.log_func(f"Profil ditulis ke {path}", "INFO")
+        return path
+
+    def _rotate(self):
+        dumps = sorted(entry for entry in os.listdir(self.directory) if entry.startswith(DUMP_PREFIX))
+        for entry in dumps[:max(0, len(dumps) - self.keep)]:
+            shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
@@ -0,0 +1,63 @@
+from functools import lru_cache
+
+HISTORY_HEADER = "Here's our conversation history (most recent last):\n"
+HISTORY_FOOTER = "\nRemember this context when replying. Keep your response conversational and natural.\n"
+REPLY_INSTRUCTION = "Reply to the following message in English, maintaining the context of our previous conversation: "
+# You can keep the instruction in Bahasa Indonesia while requesting English output
+STYLE_INSTRUCTION = "\n\nBuatlah menjadi 1 kalimat dalam bahasa Inggris, menggunakan bahasa kasual chatting di discord tanpa huruf kapital"
+
+def estimate_tokens(text):
+    # Roughly 4 characters per token for English, good enough to bound prompt size
+    return (len(text) + 3) // 4
+
+@lru_cache(maxsize=256)
+def persona_prefix(persona):
+    """The persona sentence is the same for every prompt of a channel, built and sized once."""
+    if not persona:
+        return "", 0
+    prefix = f"You are {persona}. Remember this character, but you show this character only if being asked. "
+    return prefix, estimate_tokens(prefix)
+
+FIXED_TOKENS = estimate_tokens(HISTORY_HEADER + HISTORY_FOOTER + REPLY_INSTRUCTION + STYLE_INSTRUCTION)
+
+EXCHANGE_OVERHEAD = len("User: \nYou: \n")
+
+class PromptBuilder:
+    """
+    Builds the Gemini reply prompt within a token budget.
+
+    The persona prefix, the instructions and the message itself always go in.
+    History fills whatever budget is left, newest exchange first, and stops at
+    the first exchange that does not fit so the included history stays
+    contiguous. Everything is joined once at the end.
+    """
+
+    def __init__(self, token_budget=2000):
+        self.token_budget = token_budget
+
+    def select_history(self, conversation_history, available):
+        """The newest exchanges that fit in `available` tokens, oldest first."""
+        count = 0
+        for exchange in reversed(conversation_history):
+            # Sized from the lengths alone, only exchanges that fit get formatted
+            cost = (len(exchange.user) + len(exchange.bot) + EXCHANGE_OVERHEAD + 3) // 4
+            if cost > available:
+                break
+            available -= cost
+            count += 1
+        return conversation_history[len(conversation_history) - count:]
+
+    def build(self, user_message, persona=None, conversation_history=None):
+        prefix, prefix_tokens = persona_prefix(persona)
+        parts = [prefix]
+        if conversation_history:
+            available = self.token_budget - prefix_tokens - FIXED_TOKENS - estimate_tokens(user_message)
+            exchanges = self.select_history(conversation_history, available)
+            if exchanges:
+                parts.append(HISTORY_HEADER)
+                parts.extend(f"User: {exchange.user}\nYou: {exchange.bot}\n" for exchange in exchanges)
+                parts.append(HISTORY_FOOTER)
+        parts.append(REPLY_INSTRUCTION)
+        parts.append(user_message)
+        parts.append(STYLE_INSTRUCTION)
+        return "".join(parts)
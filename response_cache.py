@@ -0,0 +1,102 @@
+import hashlib
+import random
+import threading
+import time
+from collections import OrderedDict
+
+class _Entry:
+    __slots__ = ("created", "variants", "size")
+
+    def __init__(self, created):
+        self.created = created
+        self.variants = []
+        self.size = 0
+
+class ResponseCache:
+    """
+    LRU + TTL cache for generated replies, bounded by the total size of the
+    cached text in bytes.
+
+    Each key keeps up to `max_variants` different generations. get() can
+    exclude a text (the previous reply) so the duplicate-text check still
+    gets a different answer when one is cached.
+    """
+
+    def __init__(self, max_bytes=1024 * 1024, ttl=600, max_variants=3):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_variants = max_variants
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts):
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(repr(part).encode("utf-8"))
+            digest.update(b"\x1f")
+        return digest.hexdigest()
+
+    def _drop(self, key):
+        # Caller must hold the lock
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get(self, key, exclude=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created > self.ttl:
+                self._drop(key)
+                entry = None
+            candidates = [text for text in entry.variants if text != exclude] if entry else []
+            if not candidates:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return random.choice(candidates)
+
+    def put(self, key, text):
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry.created > self.ttl:
+                if entry is not None:
+                    self._drop(key)
+                entry = _Entry(now)
+                self._entries[key] = entry
+            if text in entry.variants:
+                return
+            entry.variants.append(text)
+            entry.size += size
+            self._bytes += size
+            if len(entry.variants) > self.max_variants:
+                removed = entry.variants.pop(0)
+                removed_size = len(removed.encode("utf-8"))
+                entry.size -= removed_size
+                self._bytes -= removed_size
+            self._entries.move_to_end(key)
+            # Evict least recently used keys until we fit again
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "keys": len(self._entries),
+                "bytes": self._bytes,
+            }
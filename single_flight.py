@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+class _Call:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Thread version: concurrent do() calls with the same key run func once and
+    all get its result (or its exception). Nothing is cached, the next call
+    after the shared one finishes runs func again.
+    """
+
+    def __init__(self):
+        self.shared = 0  # Calls answered by another caller's request
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            owner = call is None
+            if owner:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not owner:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = func()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+class AsyncSingleFlight:
+    """Same as SingleFlight for coroutines on one event loop, func must return an awaitable."""
+
+    def __init__(self):
+        self.shared = 0
+        self._tasks = {}
+
+    async def do(self, key, func):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            self.shared += 1
+        # A cancelled waiter must not cancel the request the others are waiting for
+        return await asyncio.shield(task)
@@ -0,0 +1,142 @@
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_cursors (
+    channel_id TEXT PRIMARY KEY,
+    last_message_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS exchanges (
+    user_id TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    user_message TEXT NOT NULL,
+    bot_response TEXT NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS exchanges_by_conversation ON exchanges (user_id, channel_id, timestamp);
+CREATE INDEX IF NOT EXISTS exchanges_by_time ON exchanges (timestamp);
+"""
+
+_STOP = object()
+
+class StateStore:
+    """
+    SQLite (WAL) backed state for warm restarts: per-channel cursors and
+    conversation history.
+
+    Nothing is read at startup. Each channel's cursor and each conversation is
+    loaded the first time it is used. Writes are queued and committed in batches
+    by one background thread, so callers never wait on the disk.
+    """
+
+    def __init__(self, path, flush_interval=1.0, batch_size=200, retention=3600, log_func=None):
+        self.path = path
+        self.log_func = log_func
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention = retention  # Exchanges older than this are pruned from disk
+        self._queue = queue.Queue()
+        self._read_lock = threading.Lock()
+        self._reader = self._connect()
+        self._reader.executescript(SCHEMA)
+        self._writer_thread = threading.Thread(target=self._write_loop, name="state-writer", daemon=True)
+        self._writer_thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def load_cursor(self, channel_id):
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT last_message_id FROM channel_cursors WHERE channel_id = ?", (str(channel_id),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load_exchanges(self, user_id, channel_id, limit, max_age):
+        """Most recent exchanges newer than max_age seconds, oldest first, as (user, bot, timestamp)."""
+        with self._read_lock:
+            rows = self._reader.execute(
+                "SELECT user_message, bot_response, timestamp FROM exchanges "
+                "WHERE user_id = ? AND channel_id = ? AND timestamp >= ? "
+                "ORDER BY timestamp DESC LIMIT ?",
+                (str(user_id), str(channel_id), time.time() - max_age, limit),
+            ).fetchall()
+        return list(reversed(rows))
+
+    def save_cursor(self, channel_id, message_id):
+        self._queue.put(("cursor", (str(channel_id), str(message_id))))
+
+    def save_exchange(self, user_id, channel_id, user_message, bot_response, timestamp):
+        self._queue.put(("exchange", (str(user_id), str(channel_id), user_message, bot_response, timestamp)))
+
+    def pending_writes(self):
+        return self._queue.qsize()
+
+    def close(self, timeout=5):
+        """Flushes queued writes and stops the writer thread."""
+        self._queue.put(_STOP)
+        self._writer_thread.join(timeout)
+        with self._read_lock:
+            self._reader.close()
+
+    def _write_loop(self):
+        connection = self._connect()
+        last_prune = 0.0
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                pass
+            # Drain whatever else is already queued into the same transaction
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [item for item in batch if item is not _STOP]
+
+            now = time.time()
+            prune = now - last_prune > self.retention
+            if batch or prune:
+                self._commit(connection, batch, now if prune else None)
+                if prune:
+                    last_prune = now
+        connection.close()
+
+    def _commit(self, connection, batch, prune_at):
+        # Only the newest cursor per channel matters
+        cursors = {}
+        exchanges = []
+        for kind, values in batch:
+            if kind == "cursor":
+                cursors[values[0]] = values[1]
+            else:
+                exchanges.append(values)
+        try:
+            with connection:
+                if cursors:
+                    connection.executemany(
+                        "INSERT INTO channel_cursors (channel_id, last_message_id) VALUES (?, ?) "
+                        "ON CONFLICT(channel_id) DO UPDATE SET last_message_id = excluded.last_message_id",
+                        cursors.items(),
+                    )
+                if exchanges:
+                    connection.executemany(
+                        "INSERT INTO exchanges (user_id, channel_id, user_message, bot_response, timestamp) VALUES (?, ?, ?, ?, ?)",
+                        exchanges,
+                    )
+                if prune_at is not None:
+                    connection.execute("DELETE FROM exchanges WHERE timestamp < ?", (prune_at - self.retention,))
+        except sqlite3.Error as e:
+            # Losing one batch of warm-restart state is better than killing the writer
+            if self.log_func:
+                self.log_func(f"Gagal menyimpan state ke {self.path}: {e}", "ERROR")